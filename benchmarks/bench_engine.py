@@ -0,0 +1,100 @@
+"""Benchmark the flow engine: fixed scalar path against the flow graph.
+
+Reports µs per solve for the standard grid/PV/battery topology on both
+paths and times the flow graph on larger sites with N sources and N
+sinks. That both paths agree is checked by tests/test_engine.py.
+
+Usage (from the repository root, with Home Assistant installed)::
+
+    python -m benchmarks.bench_engine
+    python -m benchmarks.bench_engine --nodes 10 20 50 --iterations 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from custom_components.power_helper.engine import (
+    FlowGraph,
+    FlowInput,
+    FlowResult,
+    balance,
+    compute_flows,
+    standard_graph,
+)
+
+
+def _inputs(count: int) -> list[FlowInput]:
+    rng = random.Random(42)
+    return [
+        FlowInput(
+            netz=rng.uniform(-5000, 5000),
+            pv=rng.uniform(0, 8000),
+            akku=rng.uniform(-3000, 3000),
+        )
+        for _ in range(count)
+    ]
+
+
+def bench_standard(iterations: int, akku_prio: bool) -> None:
+    inputs = _inputs(iterations)
+    out = FlowResult()
+    begin = time.perf_counter()
+    for inp in inputs:
+        compute_flows(inp, akku_prio, out)
+    scalar = time.perf_counter() - begin
+
+    graph = standard_graph(akku_prio)
+    matrix = graph.new_matrix()
+    supply = [0.0] * len(graph.sources)
+    demand = [0.0] * len(graph.sinks)
+    begin = time.perf_counter()
+    for inp in inputs:
+        haus, pv, al, ae = balance(inp)
+        supply[0] = pv
+        supply[1] = ae
+        demand[0] = haus
+        demand[1] = al
+        graph.solve(supply, demand, matrix)
+    solved = time.perf_counter() - begin
+
+    print(
+        f"standard akku_prio={akku_prio!s:<5} "
+        f"scalar {scalar / iterations * 1e6:>6.2f} µs  "
+        f"graph {solved / iterations * 1e6:>6.2f} µs"
+    )
+
+
+def bench_nodes(nodes: int, iterations: int) -> None:
+    rng = random.Random(nodes)
+    sources = [f"quelle_{i}" for i in range(nodes)] + ["netz"]
+    sinks = [f"senke_{i}" for i in range(nodes)] + ["netz"]
+    graph = FlowGraph(sources, sinks)
+    matrix = graph.new_matrix()
+    samples = [
+        ([rng.uniform(0, 3000) for _ in sources], [rng.uniform(0, 3000) for _ in sinks])
+        for _ in range(100)
+    ]
+    begin = time.perf_counter()
+    for n in range(iterations):
+        supply, demand = samples[n % 100]
+        graph.solve(supply, demand, matrix)
+    elapsed = time.perf_counter() - begin
+    print(f"graph {nodes:>3} sources x {nodes:>3} sinks  {elapsed / iterations * 1e6:>8.2f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="*", default=[5, 10, 25, 50])
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    for akku_prio in (False, True):
+        bench_standard(args.iterations, akku_prio)
+    for nodes in args.nodes:
+        bench_nodes(nodes, max(args.iterations // nodes, 100))
+
+
+if __name__ == "__main__":
+    main()
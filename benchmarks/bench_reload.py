@@ -0,0 +1,124 @@
+"""Check that options changes do not leak listeners and measure their cost.
+
+Applies a cycle of option changes to every entry through the real update
+listener and verifies after each round that the number of state-change
+subscriptions, hub sources and coordinator listeners stays flat. The
+cycle covers all three paths of ``async_update_options``:
+
+* live       computation parameters (battery priority, deadband, debounce)
+* rewire     a different grid meter entity, same entity layout
+* reload     energy sensors toggled, the entry is rebuilt
+
+Usage (from the repository root, with Home Assistant installed)::
+
+    python -m benchmarks.bench_reload
+    python -m benchmarks.bench_reload --entries 10 --rounds 200
+
+The leak check also runs as a test, see ``test_reload.py``::
+
+    python -m pytest benchmarks
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from custom_components.power_helper import hub as hub_mod
+from custom_components.power_helper.const import DOMAIN
+
+from .bench_sensor import Harness, Scenario, _track, make_entries
+from .fake_hass import FakeConfigEntry
+
+CHANGES = (
+    ("live", {"akku_prio": True, "totband_absolut": 5}),
+    ("live", {"akku_prio": False, "entprellzeit": 50}),
+    ("rewire", {"netz_leistung": "sensor.spare_grid"}),
+    ("rewire", {}),
+    ("reload", {"energie_sensoren": True}),
+    ("reload", {}),
+)
+
+
+def _counts(harness: Harness) -> tuple[int, int, int]:
+    hass = harness.hass
+    hub = hass.data[DOMAIN]["hub"]
+    listeners = 0
+    for entry_id, data in hass.data[DOMAIN].items():
+        if entry_id == "hub":
+            continue
+        coordinator = data["coordinator"]
+        listeners += len(coordinator._flow_listeners)
+        listeners += sum(len(v) for v in coordinator._source_listeners.values())
+        listeners += len(coordinator._option_listeners)
+    return hass.bus.listener_count, hub.subscription_count, listeners
+
+
+async def async_setup_harness(entries: int, pv: int) -> tuple[Harness, list[FakeConfigEntry]]:
+    """Set up ``entries`` config entries with all sources reporting 0 W."""
+    harness = Harness()
+    scenario = Scenario(entries, pv, 1, 0, False, {})
+    config_entries, sources = make_entries(scenario)
+
+    for _, entity_id in sources + [("grid", "sensor.spare_grid")]:
+        harness.hass.states.async_set(entity_id, "0", {"unit_of_measurement": "W"})
+    for entry in config_entries:
+        await harness.async_add(entry)
+    return harness, config_entries
+
+
+async def async_cycle(
+    harness: Harness,
+    entries: list[FakeConfigEntry],
+    rounds: int,
+    timings: dict[str, list[float]] | None = None,
+) -> list[tuple[int, int, int]]:
+    """Apply ``rounds`` option changes to every entry.
+
+    Returns the listener counts after every complete cycle of CHANGES, at
+    which point the options are back at their initial values.
+    """
+    counts = []
+    for n in range(rounds):
+        kind, change = CHANGES[n % len(CHANGES)]
+        for entry in entries:
+            options = {**entry.data, **change}
+            begin = time.perf_counter()
+            await harness.async_update_options(entry, options)
+            if timings is not None:
+                timings.setdefault(kind, []).append(time.perf_counter() - begin)
+        if n % len(CHANGES) == len(CHANGES) - 1:
+            counts.append(_counts(harness))
+    return counts
+
+
+async def async_main(args: argparse.Namespace) -> None:
+    harness, entries = await async_setup_harness(args.entries, args.pv)
+
+    baseline = _counts(harness)
+    timings: dict[str, list[float]] = {}
+    print(f"baseline  bus={baseline[0]} hub={baseline[1]} coordinator={baseline[2]}")
+
+    # Nach jedem vollständigen Zyklus muss alles wieder beim Ausgangsstand sein
+    for cycle, counts in enumerate(await async_cycle(harness, entries, args.rounds, timings), 1):
+        if counts != baseline:
+            raise SystemExit(f"listener leak after cycle {cycle}: {counts} != {baseline}")
+
+    for kind, values in timings.items():
+        print(f"{kind:<8} {len(values):>6} changes {sum(values) / len(values) * 1e6:>9.1f} µs/change")
+    print(f"final     bus={_counts(harness)[0]} hub={_counts(harness)[1]} coordinator={_counts(harness)[2]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=3, help="config entries")
+    parser.add_argument("--pv", type=int, default=2, help="PV strings per entry")
+    parser.add_argument("--rounds", type=int, default=60, help="option changes per entry")
+    args = parser.parse_args()
+    with mock.patch.object(hub_mod, "async_track_state_change_event", _track):
+        asyncio.run(async_main(args))
+
+
+if __name__ == "__main__":
+    main()
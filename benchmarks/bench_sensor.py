@@ -0,0 +1,328 @@
+"""Benchmark the powerHELPER sensor platform against synthetic meter streams.
+
+Runs the real ``async_setup_entry`` of the integration and its sensor
+platform on top of ``fake_hass`` and replays grid, PV and battery values
+at a fixed rate. Reported per scenario:
+
+* events/s       source state changes handled per CPU second
+* p50/p95/p99    callback latency per source event (µs), including timers
+* writes/event   entity state writes per source event
+* alloc/event    traced allocation peak per source event (bytes)
+
+Usage (from the repository root, with Home Assistant installed)::
+
+    python -m benchmarks.bench_sensor
+    python -m benchmarks.bench_sensor --entries 100 --pv 4 --rate 10 --seconds 30
+    python -m benchmarks.bench_sensor --option entprellzeit=50 --option totband_absolut=5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import math
+import random
+import time
+import tracemalloc
+from unittest import mock
+
+from custom_components.power_helper import (
+    async_setup_entry,
+    async_unload_entry,
+    hub as hub_mod,
+    sensor as sensor_mod,
+)
+
+from .fake_hass import FakeConfigEntry, FakeHass
+
+DEFAULT_MATRIX = (
+    # entries, pv strings, rate (Hz)
+    (1, 1, 1),
+    (1, 1, 50),
+    (1, 20, 10),
+    (10, 4, 10),
+    (100, 4, 1),
+)
+
+
+# =====================================================================
+# HARNESS
+# =====================================================================
+
+@dataclass
+class Scenario:
+    entries: int
+    pv: int
+    rate: float
+    seconds: float
+    shared: bool
+    options: dict
+
+
+@dataclass
+class Result:
+    scenario: Scenario
+    events: int
+    cpu: float
+    latencies: list[float]
+    writes: int
+    alloc: float
+    listeners: int
+
+    def row(self) -> str:
+        lat = sorted(self.latencies)
+        def pct(p: float) -> float:
+            return lat[min(len(lat) - 1, int(p * len(lat)))] * 1e6 if lat else 0.0
+        s = self.scenario
+        return (
+            f"{s.entries:>7} {s.pv:>3} {s.rate:>5g} "
+            f"{self.events:>9} {self.events / self.cpu if self.cpu else 0:>11.0f} "
+            f"{pct(0.50):>7.1f} {pct(0.95):>7.1f} {pct(0.99):>7.1f} "
+            f"{self.writes / max(self.events, 1):>7.2f} {self.alloc:>9.0f} {self.listeners:>6}"
+        )
+
+
+HEADER = (
+    f"{'entries':>7} {'pv':>3} {'Hz':>5} {'events':>9} {'events/s':>11} "
+    f"{'p50µs':>7} {'p95µs':>7} {'p99µs':>7} {'wr/ev':>7} {'allocB/ev':>9} {'subs':>6}"
+)
+
+
+class Harness:
+    """Set up powerHELPER entries on a FakeHass and count entity writes."""
+
+    def __init__(self) -> None:
+        self.hass = FakeHass()
+        self.entities: dict[str, list] = {}
+        self.writes = 0
+        self.hass.config_entries.forward = self._async_forward
+        self.hass.config_entries.unload = self._async_unload
+        self.hass.reload = self.async_reload
+
+    def _count_write(self) -> None:
+        self.writes += 1
+
+    async def _async_forward(self, entry: FakeConfigEntry) -> None:
+        added: list = []
+        await sensor_mod.async_setup_entry(self.hass, entry, added.extend)
+        for entity in added:
+            entity.hass = self.hass
+            entity.entity_id = f"sensor.{entity.unique_id}"
+            entity.async_write_ha_state = self._count_write
+            if hasattr(entity, "async_get_last_sensor_data"):
+                entity.async_get_last_sensor_data = _no_restore
+            if hasattr(entity, "async_get_last_state"):
+                entity.async_get_last_state = _no_restore
+            await entity.async_added_to_hass()
+        self.entities[entry.entry_id] = added
+
+    async def _async_unload(self, entry: FakeConfigEntry) -> bool:
+        for entity in self.entities.pop(entry.entry_id, []):
+            await entity.async_will_remove_from_hass()
+            for func in entity._on_remove or ():
+                func()
+            entity._on_remove = None
+        return True
+
+    async def async_add(self, entry: FakeConfigEntry) -> None:
+        self.hass.entries[entry.entry_id] = entry
+        await async_setup_entry(self.hass, entry)
+
+    async def async_remove(self, entry: FakeConfigEntry) -> None:
+        await async_unload_entry(self.hass, entry)
+        entry.run_unload_callbacks()
+
+    async def async_reload(self, entry_id: str) -> None:
+        entry = self.hass.entries[entry_id]
+        await self.async_remove(entry)
+        await self.async_add(entry)
+
+    async def async_update_options(self, entry: FakeConfigEntry, options: dict) -> None:
+        """Apply new options the way the config entry manager does."""
+        entry.options = options
+        for listener in list(entry._update_listeners):
+            await listener(self.hass, entry)
+
+
+async def _no_restore():
+    return None
+
+
+def _track(hass, entity_ids, action):
+    return hass.bus.track(entity_ids, action)
+
+
+def make_entries(scenario: Scenario) -> tuple[list[FakeConfigEntry], list[tuple[str, str]]]:
+    """Create config entries and the (role, entity_id) list of every source."""
+    entries = []
+    sources: dict[str, str] = {}
+    for i in range(scenario.entries):
+        prefix = "sensor.shared" if scenario.shared else f"sensor.site{i}"
+        grid = f"{prefix}_grid"
+        battery = f"{prefix}_battery"
+        pv = [f"{prefix}_pv{j}" for j in range(scenario.pv)]
+        sources.update(dict.fromkeys(pv, "pv"))
+        sources[battery] = "battery"
+        sources[grid] = "grid"
+        entries.append(
+            FakeConfigEntry(
+                entry_id=f"entry{i}",
+                title=f"Site {i}",
+                data={
+                    "netz_leistung": grid,
+                    "pv_leistung": pv,
+                    "akku_leistung": battery,
+                },
+                options={
+                    "netz_leistung": grid,
+                    "pv_leistung": pv,
+                    "akku_leistung": battery,
+                    **scenario.options,
+                },
+            )
+        )
+    return entries, [(role, entity_id) for entity_id, role in sources.items()]
+
+
+def stream(scenario: Scenario, sources: list[tuple[str, str]], start: float):
+    """Yield (timestamp, entity_id, value) of a synthetic meter stream.
+
+    All sources of one tick are published within a few milliseconds of
+    each other, the way inverters and meters usually report.
+    """
+    rng = random.Random(42)
+    period = 1 / scenario.rate
+    ticks = int(scenario.seconds * scenario.rate)
+    pv_count = max(scenario.pv, 1)
+    for tick in range(ticks):
+        t = start + tick * period
+        sun = max(math.sin(tick / max(ticks, 1) * math.pi), 0)
+        house = 400 + rng.random() * 2000
+        pv_total = 0.0
+        n = 0
+        for role, entity_id in sources:
+            # Quellen einer Anlage melden kurz nacheinander, Anlagen parallel
+            ts = t + n * 0.002
+            n += 1
+            if role == "pv":
+                value = 8000 * sun / pv_count * (0.9 + 0.2 * rng.random())
+                pv_total += value
+            elif role == "battery":
+                value = rng.uniform(-2000, 2000)
+            else:
+                value = house - pv_total
+                pv_total = 0.0
+                n = 0
+            yield ts, entity_id, round(value, 1)
+
+
+# =====================================================================
+# RUN
+# =====================================================================
+
+async def run_scenario(scenario: Scenario) -> Result:
+    harness = Harness()
+    hass = harness.hass
+    entries, sources = make_entries(scenario)
+
+    for role, entity_id in sources:
+        hass.states.async_set(entity_id, "0", {"unit_of_measurement": "W"})
+    for entry in entries:
+        await harness.async_add(entry)
+
+    attributes = {"unit_of_measurement": "W"}
+    latencies: list[float] = []
+    harness.writes = 0
+    events = 0
+    cpu = 0.0
+
+    for ts, entity_id, value in stream(scenario, sources, hass.loop.time() + 1):
+        begin = time.perf_counter()
+        hass.loop.advance_to(ts)
+        hass.states.async_set(entity_id, str(value), attributes)
+        elapsed = time.perf_counter() - begin
+        latencies.append(elapsed)
+        cpu += elapsed
+        events += 1
+
+    begin = time.perf_counter()
+    hass.loop.advance_to(hass.loop.time() + 10)
+    cpu += time.perf_counter() - begin
+    writes = harness.writes
+
+    # Zweiter, kurzer Durchlauf nur für die Allokationsmessung
+    alloc_samples = []
+    tracemalloc.start()
+    for n, (ts, entity_id, value) in enumerate(
+        stream(scenario, sources, hass.loop.time() + 1)
+    ):
+        if n >= 2000:
+            break
+        hass.loop.advance_to(ts)
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        hass.states.async_set(entity_id, str(value), attributes)
+        alloc_samples.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    listeners = hass.bus.listener_count
+    for entry in entries:
+        await harness.async_remove(entry)
+
+    return Result(
+        scenario=scenario,
+        events=events,
+        cpu=cpu,
+        latencies=latencies,
+        writes=writes,
+        alloc=sum(alloc_samples) / max(len(alloc_samples), 1),
+        listeners=listeners,
+    )
+
+
+def _parse_options(values: list[str]) -> dict:
+    options = {}
+    for item in values:
+        key, _, raw = item.partition("=")
+        try:
+            options[key] = int(raw)
+        except ValueError:
+            try:
+                options[key] = float(raw)
+            except ValueError:
+                options[key] = {"true": True, "false": False}.get(raw.lower(), raw)
+    return options
+
+
+async def async_main(args: argparse.Namespace) -> None:
+    options = _parse_options(args.option)
+    if args.entries or args.pv or args.rate:
+        matrix = [(args.entries or 1, args.pv or 1, args.rate or 1)]
+    else:
+        matrix = DEFAULT_MATRIX
+
+    print(HEADER)
+    with mock.patch.object(hub_mod, "async_track_state_change_event", _track):
+        for entries, pv, rate in matrix:
+            scenario = Scenario(entries, pv, rate, args.seconds, args.shared, options)
+            result = await run_scenario(scenario)
+            print(result.row())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, help="config entries (1-100)")
+    parser.add_argument("--pv", type=int, help="PV strings per entry (1-20)")
+    parser.add_argument("--rate", type=float, help="meter rate in Hz (1-50)")
+    parser.add_argument("--seconds", type=float, default=60, help="virtual duration")
+    parser.add_argument(
+        "--shared", action="store_true", help="all entries use the same source entities"
+    )
+    parser.add_argument(
+        "--option", action="append", default=[], help="entry option key=value"
+    )
+    asyncio.run(async_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
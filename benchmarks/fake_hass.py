@@ -0,0 +1,201 @@
+"""Lightweight in-process stand-in for the parts of hass used by powerHELPER.
+
+Only the state machine, the state-change subscription and the event loop
+timers are simulated; everything else (coordinator, entities, setup code)
+is the real integration code. Time is virtual: the loop clock is advanced
+by the benchmark, so a 50 Hz stream over an hour runs as fast as the CPU
+allows while coalescing timers still fire at the right moments.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+import heapq
+import itertools
+from types import MappingProxyType
+from typing import Any, Callable
+
+
+# =====================================================================
+# LOOP / CLOCK
+# =====================================================================
+
+class FakeTimerHandle:
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, callback: Callable, args: tuple) -> None:
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class FakeLoop:
+    """Virtual-time replacement for the asyncio timer API."""
+
+    def __init__(self, start: float = 1_700_000_000.0) -> None:
+        self._now = start
+        self._timers: list[tuple[float, int, FakeTimerHandle]] = []
+        self._seq = itertools.count()
+
+    def time(self) -> float:
+        return self._now
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> FakeTimerHandle:
+        return self.call_at(self._now + delay, callback, *args)
+
+    def call_at(self, when: float, callback: Callable, *args: Any) -> FakeTimerHandle:
+        handle = FakeTimerHandle(when, callback, args)
+        heapq.heappush(self._timers, (when, next(self._seq), handle))
+        return handle
+
+    def call_soon(self, callback: Callable, *args: Any) -> FakeTimerHandle:
+        return self.call_at(self._now, callback, *args)
+
+    def advance_to(self, when: float) -> None:
+        """Run all timers due up to ``when`` and move the clock there."""
+        while self._timers and self._timers[0][0] <= when:
+            due, _, handle = heapq.heappop(self._timers)
+            self._now = max(self._now, due)
+            if not handle.cancelled:
+                handle.callback(*handle.args)
+        self._now = max(self._now, when)
+
+
+# =====================================================================
+# STATE MACHINE / EVENT BUS
+# =====================================================================
+
+class FakeState:
+    __slots__ = (
+        "entity_id",
+        "state",
+        "attributes",
+        "last_updated_timestamp",
+        "last_reported_timestamp",
+    )
+
+    def __init__(self, entity_id: str, state: str, attributes: dict, ts: float) -> None:
+        self.entity_id = entity_id
+        self.state = state
+        self.attributes = MappingProxyType(attributes)
+        self.last_updated_timestamp = ts
+        # Jede Meldung, auch mit unverändertem Wert
+        self.last_reported_timestamp = ts
+
+
+class FakeEvent:
+    __slots__ = ("data", "time_fired_timestamp")
+
+    def __init__(self, data: dict, ts: float) -> None:
+        self.data = data
+        self.time_fired_timestamp = ts
+
+
+class FakeStates:
+    def __init__(self, hass: "FakeHass") -> None:
+        self._hass = hass
+        self._states: dict[str, FakeState] = {}
+
+    def get(self, entity_id: str) -> FakeState | None:
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id: str, state: str, attributes: dict | None = None) -> None:
+        ts = self._hass.loop.time()
+        old = self._states.get(entity_id)
+        new = FakeState(entity_id, state, attributes or {}, ts)
+        self._states[entity_id] = new
+        event = FakeEvent(
+            {"entity_id": entity_id, "old_state": old, "new_state": new}, ts
+        )
+        self._hass.bus.fire_state_changed(entity_id, event)
+
+
+class FakeBus:
+    def __init__(self) -> None:
+        self._listeners: dict[str, list[Callable]] = defaultdict(list)
+        self.events_fired = 0
+
+    def track(self, entity_ids, action: Callable) -> Callable[[], None]:
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        entity_ids = list(dict.fromkeys(entity_ids))
+        for entity_id in entity_ids:
+            self._listeners[entity_id].append(action)
+
+        def remove() -> None:
+            for entity_id in entity_ids:
+                self._listeners[entity_id].remove(action)
+
+        return remove
+
+    @property
+    def listener_count(self) -> int:
+        return sum(len(v) for v in self._listeners.values())
+
+    def fire_state_changed(self, entity_id: str, event: FakeEvent) -> None:
+        self.events_fired += 1
+        for action in list(self._listeners.get(entity_id, ())):
+            action(event)
+
+
+# =====================================================================
+# HASS / CONFIG ENTRY
+# =====================================================================
+
+class FakeConfigEntries:
+    def __init__(self, hass: "FakeHass") -> None:
+        self._hass = hass
+        self.forward: Callable | None = None
+        self.unload: Callable | None = None
+
+    async def async_forward_entry_setups(self, entry, platforms) -> None:
+        await self.forward(entry)
+
+    async def async_unload_platforms(self, entry, platforms) -> bool:
+        return await self.unload(entry)
+
+    async def async_reload(self, entry_id: str) -> None:
+        await self._hass.reload(entry_id)
+
+    def async_get_entry(self, entry_id: str):
+        return self._hass.entries.get(entry_id)
+
+
+class FakeHass:
+    def __init__(self) -> None:
+        self.loop = FakeLoop()
+        self.bus = FakeBus()
+        self.states = FakeStates(self)
+        self.data: dict[str, Any] = {}
+        self.entries: dict[str, FakeConfigEntry] = {}
+        self.config_entries = FakeConfigEntries(self)
+        self.reload: Callable | None = None
+
+    def async_create_task(self, coro, *args, **kwargs):
+        raise RuntimeError("benchmark setup must not create background tasks")
+
+
+@dataclass
+class FakeConfigEntry:
+    entry_id: str
+    title: str
+    data: dict
+    options: dict = field(default_factory=dict)
+    domain: str = "power_helper"
+    _on_unload: list[Callable] = field(default_factory=list)
+    _update_listeners: list[Callable] = field(default_factory=list)
+
+    def async_on_unload(self, func: Callable) -> None:
+        self._on_unload.append(func)
+
+    def add_update_listener(self, listener: Callable) -> Callable[[], None]:
+        self._update_listeners.append(listener)
+        return lambda: self._update_listeners.remove(listener)
+
+    def run_unload_callbacks(self) -> None:
+        while self._on_unload:
+            self._on_unload.pop()()
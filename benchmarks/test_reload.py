@@ -0,0 +1,37 @@
+"""Option changes must not leak listeners, see bench_reload.py.
+
+Runs with pytest from the repository root when Home Assistant is installed::
+
+    python -m pytest benchmarks
+"""
+from __future__ import annotations
+
+import asyncio
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.power_helper import hub as hub_mod  # noqa: E402
+
+from .bench_reload import CHANGES, _counts, async_cycle, async_setup_harness  # noqa: E402
+from .bench_sensor import _track  # noqa: E402
+
+
+@pytest.mark.parametrize("entries", [1, 3])
+def test_listener_count_stays_flat(entries: int) -> None:
+    """Every live, rewire and reload change returns to the baseline counts."""
+
+    async def run() -> None:
+        harness, config_entries = await async_setup_harness(entries, pv=2)
+        baseline = _counts(harness)
+        counts = await async_cycle(harness, config_entries, rounds=3 * len(CHANGES))
+
+        assert len(counts) == 3
+        for cycle in counts:
+            # Busabos, Hub-Quellen und Coordinator-Listener
+            assert cycle == baseline
+
+    with mock.patch.object(hub_mod, "async_track_state_change_event", _track):
+        asyncio.run(run())
@@ -2,19 +2,33 @@ from __future__ import annotations
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
 from .const import DOMAIN
-from .config_flow import PowerHelperOptionsFlowHandler  # OptionsFlow aus config_flow importieren
+from .coordinator import PowerHelperCoordinator, entry_store
+from .services import async_setup_services
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the powerHELPER services."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up power_helper from a config entry."""
     # Domain-Datenspeicher sicherstellen
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = {}
+    coordinator = PowerHelperCoordinator(hass, entry)
+    hass.data[DOMAIN][entry.entry_id] = {"coordinator": coordinator}
+    entry.async_on_unload(coordinator.async_shutdown)
+    await coordinator.async_load_store()
 
-    # Reload bei Options-Änderungen
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    # Options-Änderungen möglichst ohne Reload übernehmen
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     # Plattformen weiterleiten (z. B. Sensoren)
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
@@ -25,11 +39,19 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
-    if unload_ok:
-        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    if unload_ok and (data := hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)) is not None:
+        # Zähler vor einem Reload sichern, der neue Coordinator lädt sie sofort
+        await data["coordinator"].async_save_store()
     return unload_ok
 
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload the config entry."""
-    await hass.config_entries.async_reload(entry.entry_id)
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored counters of a deleted entry."""
+    await entry_store(hass, entry.entry_id).async_remove()
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options in place, reloading only if entities change."""
+    coordinator: PowerHelperCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    if not coordinator.async_update_options():
+        await hass.config_entries.async_reload(entry.entry_id)
@@ -0,0 +1,223 @@
+"""Recompute power flows from recorder statistics and import them."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticMeanType
+from homeassistant.components.recorder.statistics import (
+    async_adjust_statistics,
+    async_import_statistics,
+    statistics_during_period,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfEnergy, UnitOfPower
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN
+from .coordinator import read_sources
+from .engine import FLOW_KEYS, compute_flows_batch
+
+_LOGGER = logging.getLogger(__name__)
+
+PERIODS = {
+    "5minute": timedelta(minutes=5),
+    "hour": timedelta(hours=1),
+}
+
+# So viele Schritte wird ein fehlender Wert mit dem letzten überbrückt
+MAX_HOLD_STEPS = 2
+
+
+# =====================================================================
+# ALIGNMENT
+# =====================================================================
+
+def align(rows: list[dict], start: float, step: float, size: int) -> np.ndarray:
+    """Place statistic means on a common time grid.
+
+    A missing step holds the last value for at most MAX_HOLD_STEPS steps;
+    longer gaps (e.g. a recorder outage) and the time before the first
+    value count as 0 W, so no energy is invented for them.
+    """
+    values = np.full(size, np.nan)
+    for row in rows:
+        if row.get("mean") is None:
+            continue
+        index = int((row["start"] - start) // step)
+        if 0 <= index < size:
+            values[index] = row["mean"]
+
+    # Kurze Lücken mit dem letzten bekannten Wert auffüllen, sonst 0 W
+    index = np.arange(size)
+    last = np.where(~np.isnan(values), index, -1)
+    np.maximum.accumulate(last, out=last)
+    held = (last >= 0) & (index - last <= MAX_HOLD_STEPS)
+    return np.where(held, values[np.maximum(last, 0)], 0.0)
+
+
+# =====================================================================
+# SERVICE
+# =====================================================================
+
+async def async_backfill(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    start: datetime,
+    end: datetime,
+    period: str,
+) -> None:
+    """Recompute all flows between start and end and import their energy."""
+    data = entry.options or entry.data
+    registry = er.async_get(hass)
+
+    # Statistik-IDs der Energiesensoren dieses Eintrags
+    targets = {
+        key: entity_id
+        for key in FLOW_KEYS
+        if (
+            entity_id := registry.async_get_entity_id(
+                "sensor", DOMAIN, f"{DOMAIN}_{entry.entry_id}_{key}_energie"
+            )
+        )
+    }
+    if not targets:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="no_energy_sensors",
+        )
+
+    step = PERIODS[period]
+    start = start.replace(minute=0, second=0, microsecond=0)
+    size = int((end - start) / step)
+    if size <= 0:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_range",
+        )
+
+    sources, inverted = read_sources(data)
+    statistic_ids = {e for entity_ids in sources.values() for e in entity_ids}
+
+    stats = await get_instance(hass).async_add_executor_job(
+        statistics_during_period,
+        hass,
+        start,
+        end,
+        statistic_ids,
+        period,
+        {"power": UnitOfPower.WATT},
+        {"mean"},
+    )
+
+    t0 = start.timestamp()
+    dt = step.total_seconds()
+
+    def series(role: str) -> np.ndarray:
+        # Mehrere Quellen einer Rolle werden wie im Live-Pfad summiert
+        total = np.zeros(size)
+        for entity_id in sources[role]:
+            values = align(stats.get(entity_id, []), t0, dt, size)
+            total += -values if entity_id in inverted else values
+        return total
+
+    flows = compute_flows_batch(
+        series("netz"),
+        series("pv"),
+        series("akku"),
+        series("netz_bezug"),
+        series("netz_einspeisung"),
+        series("akku_laden"),
+        series("akku_entladen"),
+        data.get("akku_prio", False),
+    )
+
+    # Stündliche Energie (kWh) für die Langzeitstatistik
+    per_hour = int(3600 // dt)
+    hours = size // per_hour
+    hour_starts = [start + timedelta(hours=h) for h in range(hours)]
+
+    for key, statistic_id in targets.items():
+        energy = np.maximum(flows[key][: hours * per_hour], 0) * dt / 3600 / 1000
+        hourly = energy.reshape(hours, per_hour).sum(axis=1)
+        await _async_import(hass, statistic_id, hour_starts, hourly)
+
+    _LOGGER.info(
+        "Backfilled %s flows of %s from %s to %s",
+        len(targets),
+        entry.title,
+        start,
+        end,
+    )
+
+
+async def _async_import(
+    hass: HomeAssistant,
+    statistic_id: str,
+    hour_starts: list[datetime],
+    hourly: np.ndarray,
+) -> None:
+    """Import hourly sums so they join the existing statistics seamlessly."""
+    if not hour_starts:
+        return
+
+    first = hour_starts[0]
+    last = hour_starts[-1]
+    existing = await get_instance(hass).async_add_executor_job(
+        statistics_during_period,
+        hass,
+        first - timedelta(hours=1),
+        last + timedelta(hours=1),
+        {statistic_id},
+        "hour",
+        None,
+        {"sum"},
+    )
+    rows = existing.get(statistic_id, [])
+
+    # Anschluss an die vorhandene Summe vor dem Zeitraum
+    baseline = 0.0
+    old_end = None
+    for row in rows:
+        if row.get("sum") is None:
+            continue
+        if row["start"] < first.timestamp():
+            baseline = row["sum"]
+        elif row["start"] <= last.timestamp():
+            old_end = row["sum"]
+
+    sums = baseline + np.cumsum(hourly)
+    async_import_statistics(
+        hass,
+        {
+            "has_mean": False,
+            "mean_type": StatisticMeanType.NONE,
+            "has_sum": True,
+            "name": None,
+            "source": "recorder",
+            "statistic_id": statistic_id,
+            "unit_class": "energy",
+            "unit_of_measurement": UnitOfEnergy.KILO_WATT_HOUR,
+        },
+        # Nur die Summe: der Zustand eines TOTAL_INCREASING-Sensors ist sein
+        # Zählerstand, den der Live-Sensor selbst führt und der nicht der Summe entspricht
+        [
+            {"start": hour_start, "sum": float(total)}
+            for hour_start, total in zip(hour_starts, sums)
+        ],
+    )
+
+    # Spätere Summen um die Differenz verschieben, damit kein Sprung entsteht
+    if old_end is not None and sums[-1] != old_end:
+        async_adjust_statistics(
+            hass,
+            statistic_id,
+            last + timedelta(hours=1),
+            float(sums[-1] - old_end),
+            UnitOfEnergy.KILO_WATT_HOUR,
+        )
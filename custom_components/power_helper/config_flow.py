@@ -7,23 +7,66 @@ from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.helpers.selector import (
     EntitySelector,
     EntitySelectorConfig,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
 )
 
-from .const import DOMAIN
-
-CONF_TITLE = "title"
-
-CONF_GRID_POWER = "netz_leistung"
-CONF_GRID_IMPORT = "netz_bezug"
-CONF_GRID_EXPORT = "netz_einspeisung"
+from .const import (
+    CONF_BAT_CHARGE,
+    CONF_BAT_DEVICE_FLOWS,
+    CONF_BAT_DISCHARGE,
+    CONF_BAT_INVERTED,
+    CONF_BAT_INVERTED_DEVICES,
+    CONF_BAT_POWER,
+    CONF_BAT_PRIO,
+    CONF_CONSUMER_PRIO,
+    CONF_CONSUMERS,
+    CONF_DEADBAND_ABS,
+    CONF_DEADBAND_REL,
+    CONF_DEBOUNCE,
+    CONF_ENERGY,
+    CONF_FEED_IN_TARIFF,
+    CONF_FILTER_LIMIT,
+    CONF_FILTER_MEDIAN,
+    CONF_FILTER_TAU,
+    CONF_GRID_EXPORT,
+    CONF_GRID_IMPORT,
+    CONF_GRID_INVERTED,
+    CONF_GRID_POWER,
+    CONF_INSTRUMENTATION,
+    CONF_INTEGRATION_METHOD,
+    CONF_INTERPOLATION,
+    CONF_MAX_AGE,
+    CONF_MAX_SOURCE_AGE,
+    CONF_MIN_INTERVAL,
+    CONF_MIN_INTERVAL_INPUT,
+    CONF_PERIOD_COUNTERS,
+    CONF_PHASES,
+    CONF_PRECISION,
+    CONF_PRICE,
+    CONF_PRODUCERS,
+    CONF_PV_POWER,
+    CONF_RATIOS,
+    CONF_SNAPSHOT,
+    CONF_STALE_MODE,
+    CONF_STATISTICS,
+    CONF_TITLE,
+    DOMAIN,
+    PHASE_ROLES,
+    PHASES,
+)
 
-CONF_PV_POWER = "pv_leistung"
+INTEGRATION_METHODS = {
+    "trapez": "Trapezoidal",
+    "links": "Left",
+}
 
-CONF_BAT_POWER = "akku_leistung"
-CONF_BAT_CHARGE = "akku_laden"
-CONF_BAT_DISCHARGE = "akku_entladen"
-CONF_BAT_PRIO = "akku_prio"
-CONF_BAT_INVERTED = "akku_leistung_invertiert"
+STALE_MODES = {
+    "halten": "Hold last value",
+    "null": "Zero",
+    "nicht_verfuegbar": "Unavailable",
+}
 
 
 # ============================================================
@@ -75,6 +118,17 @@ class PowerHelperFlowBase:
         if not total and (bool(part_a) ^ bool(part_b)):
             raise ValueError("missing_required_sensors")
 
+    def _validate_inverted(self, *, total: list[str] | None, inverted: list[str] | None) -> None:
+        # Invertieren geht nur bei ausgewählten Gesamtsensoren
+        if inverted and not set(inverted).issubset(total or []):
+            raise ValueError("inverted_not_selected")
+
+    def _as_list(self, key: str) -> None:
+        # Frühere Einträge speichern einzelne Entitäten als String
+        value = self._data.get(key)
+        if isinstance(value, str):
+            self._data[key] = [value]
+
 
 # ============================================================
 # Config Flow (Ersteinrichtung)
@@ -114,6 +168,10 @@ class PowerHelperConfigFlow(
                     part_b=user_input.get(CONF_GRID_EXPORT),
                     allow_empty=False,
                 )
+                self._validate_inverted(
+                    total=user_input.get(CONF_GRID_POWER),
+                    inverted=user_input.get(CONF_GRID_INVERTED),
+                )
             except ValueError as err:
                 errors["base"] = err.args[0]
             else:
@@ -124,7 +182,8 @@ class PowerHelperConfigFlow(
             step_id="grid",
             data_schema=vol.Schema(
                 {
-                    vol.Optional(CONF_GRID_POWER): self._power_selector(),
+                    vol.Optional(CONF_GRID_POWER): self._power_selector_multi(),
+                    vol.Optional(CONF_GRID_INVERTED): self._power_selector_multi(),
                     vol.Optional(CONF_GRID_IMPORT): self._power_selector(),
                     vol.Optional(CONF_GRID_EXPORT): self._power_selector(),
                 }
@@ -157,6 +216,10 @@ class PowerHelperConfigFlow(
                     part_b=user_input.get(CONF_BAT_DISCHARGE),
                     allow_empty=True,
                 )
+                self._validate_inverted(
+                    total=user_input.get(CONF_BAT_POWER),
+                    inverted=user_input.get(CONF_BAT_INVERTED_DEVICES),
+                )
             except ValueError as err:
                 errors["base"] = err.args[0]
             else:
@@ -170,11 +233,12 @@ class PowerHelperConfigFlow(
             step_id="battery",
             data_schema=vol.Schema(
                 {
-                    vol.Optional(CONF_BAT_POWER): self._power_selector(),
-                    vol.Optional(CONF_BAT_INVERTED, default=False): bool,
+                    vol.Optional(CONF_BAT_POWER): self._power_selector_multi(),
+                    vol.Optional(CONF_BAT_INVERTED_DEVICES): self._power_selector_multi(),
                     vol.Optional(CONF_BAT_CHARGE): self._power_selector(),
                     vol.Optional(CONF_BAT_DISCHARGE): self._power_selector(),
                     vol.Optional(CONF_BAT_PRIO, default=False): bool,
+                    vol.Optional(CONF_BAT_DEVICE_FLOWS, default=False): bool,
                 }
             ),
             errors=errors,
@@ -209,7 +273,12 @@ class PowerHelperOptionsFlowHandler(
         steps = {
             "grid": "Grid Power",
             "pv": "PV Power",
-            "battery": "Battery Power"
+            "battery": "Battery Power",
+            "nodes": "Producers & Consumers",
+            "phases": "Phases",
+            "filter": "Input filter",
+            "tariff": "Tariff",
+            "advanced": "Advanced",
         }
 
         if user_input is not None:
@@ -235,14 +304,20 @@ class PowerHelperOptionsFlowHandler(
                     part_b=user_input.get(CONF_GRID_EXPORT),
                     allow_empty=True,
                 )
+                self._validate_inverted(
+                    total=user_input.get(CONF_GRID_POWER),
+                    inverted=user_input.get(CONF_GRID_INVERTED),
+                )
             except ValueError as err:
                 errors["base"] = err.args[0]
             else:
-                for key in [CONF_GRID_POWER, CONF_GRID_IMPORT, CONF_GRID_EXPORT]:
+                for key in [CONF_GRID_POWER, CONF_GRID_INVERTED, CONF_GRID_IMPORT, CONF_GRID_EXPORT]:
                     self._update_optional(key, user_input)
 
                 return self.async_create_entry(data=self._data)
 
+        self._as_list(CONF_GRID_POWER)
+
         return self.async_show_form(
             step_id="grid",
             data_schema=vol.Schema(
@@ -250,7 +325,11 @@ class PowerHelperOptionsFlowHandler(
                     vol.Optional(
                         CONF_GRID_POWER,
                         default=self._data.get(CONF_GRID_POWER),
-                    ): vol.Maybe(self._power_selector()),
+                    ): vol.Maybe(self._power_selector_multi()),
+                    vol.Optional(
+                        CONF_GRID_INVERTED,
+                        default=self._data.get(CONF_GRID_INVERTED),
+                    ): vol.Maybe(self._power_selector_multi()),
                     vol.Optional(
                         CONF_GRID_IMPORT,
                         default=self._data.get(CONF_GRID_IMPORT),
@@ -297,19 +376,29 @@ class PowerHelperOptionsFlowHandler(
                     part_b=user_input.get(CONF_BAT_DISCHARGE),
                     allow_empty=True,
                 )
+                self._validate_inverted(
+                    total=user_input.get(CONF_BAT_POWER),
+                    inverted=user_input.get(CONF_BAT_INVERTED_DEVICES),
+                )
             except ValueError as err:
                 errors["base"] = err.args[0]
             else:
                 for key in [
                     CONF_BAT_POWER,
+                    CONF_BAT_INVERTED_DEVICES,
                     CONF_BAT_CHARGE,
                     CONF_BAT_DISCHARGE,
                     CONF_BAT_PRIO,
-                    CONF_BAT_INVERTED,
+                    CONF_BAT_DEVICE_FLOWS,
                 ]:
                     self._update_optional(key, user_input)
+                # Der frühere Schalter ist durch die Geräteliste ersetzt
+                self._data.pop(CONF_BAT_INVERTED, None)
                 return self.async_create_entry(data=self._data)
 
+        self._as_list(CONF_BAT_POWER)
+        if self._data.get(CONF_BAT_INVERTED) and CONF_BAT_INVERTED_DEVICES not in self._data:
+            self._data[CONF_BAT_INVERTED_DEVICES] = self._data.get(CONF_BAT_POWER) or []
 
         return self.async_show_form(
             step_id="battery",
@@ -318,11 +407,11 @@ class PowerHelperOptionsFlowHandler(
                     vol.Optional(
                         CONF_BAT_POWER,
                         default=self._data.get(CONF_BAT_POWER),
-                    ): vol.Maybe(self._power_selector()),
+                    ): vol.Maybe(self._power_selector_multi()),
                     vol.Optional(
-                        CONF_BAT_INVERTED,
-                        default=self._data.get(CONF_BAT_INVERTED, False),
-                    ): bool,
+                        CONF_BAT_INVERTED_DEVICES,
+                        default=self._data.get(CONF_BAT_INVERTED_DEVICES),
+                    ): vol.Maybe(self._power_selector_multi()),
                     vol.Optional(
                         CONF_BAT_CHARGE,
                         default=self._data.get(CONF_BAT_CHARGE),
@@ -335,7 +424,287 @@ class PowerHelperOptionsFlowHandler(
                         CONF_BAT_PRIO,
                         default=self._data.get(CONF_BAT_PRIO, False),
                     ): bool,
+                    vol.Optional(
+                        CONF_BAT_DEVICE_FLOWS,
+                        default=self._data.get(CONF_BAT_DEVICE_FLOWS, False),
+                    ): bool,
                 }
             ),
             errors=errors,
         )
+
+    async def async_step_nodes(self, user_input=None):
+        if user_input is not None:
+            for key in (CONF_PRODUCERS, CONF_CONSUMERS, CONF_CONSUMER_PRIO):
+                self._update_optional(key, user_input)
+            return self.async_create_entry(data=self._data)
+
+        return self.async_show_form(
+            step_id="nodes",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_PRODUCERS,
+                        default=self._data.get(CONF_PRODUCERS),
+                    ): vol.Maybe(self._power_selector_multi()),
+                    vol.Optional(
+                        CONF_CONSUMERS,
+                        default=self._data.get(CONF_CONSUMERS),
+                    ): vol.Maybe(self._power_selector_multi()),
+                    vol.Optional(
+                        CONF_CONSUMER_PRIO,
+                        default=self._data.get(CONF_CONSUMER_PRIO, False),
+                    ): bool,
+                }
+            ),
+        )
+
+    async def async_step_phases(self, user_input=None):
+        errors = {}
+        keys = [f"{role}_{phase}" for role in PHASE_ROLES for phase in PHASES]
+
+        if user_input is not None:
+            # Ohne alle drei Netzphasen keine Bilanz je Phase
+            if user_input.get(CONF_PHASES) and not all(
+                user_input.get(f"netz_{phase}") for phase in PHASES
+            ):
+                errors["base"] = "phase_grid_missing"
+            else:
+                self._data[CONF_PHASES] = user_input.get(CONF_PHASES, False)
+                for key in keys:
+                    self._update_optional(key, user_input)
+
+                return self.async_create_entry(data=self._data)
+
+        schema = {
+            vol.Optional(
+                CONF_PHASES,
+                default=self._data.get(CONF_PHASES, False),
+            ): bool,
+        }
+        for key in keys:
+            schema[vol.Optional(key, default=self._data.get(key))] = vol.Maybe(self._power_selector())
+
+        return self.async_show_form(
+            step_id="phases",
+            data_schema=vol.Schema(schema),
+            errors=errors,
+        )
+
+    async def async_step_filter(self, user_input=None):
+        if user_input is not None:
+            self._data.update(user_input)
+            return self.async_create_entry(data=self._data)
+
+        return self.async_show_form(
+            step_id="filter",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_FILTER_LIMIT,
+                        default=self._data.get(CONF_FILTER_LIMIT, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=1000000,
+                            step=1,
+                            unit_of_measurement="W",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_FILTER_MEDIAN,
+                        default=self._data.get(CONF_FILTER_MEDIAN, 1),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=1,
+                            max=9,
+                            step=2,
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_FILTER_TAU,
+                        default=self._data.get(CONF_FILTER_TAU, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=600,
+                            step=0.1,
+                            unit_of_measurement="s",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                }
+            ),
+        )
+
+    async def async_step_tariff(self, user_input=None):
+        if user_input is not None:
+            for key in (CONF_PRICE, CONF_FEED_IN_TARIFF):
+                self._update_optional(key, user_input)
+            return self.async_create_entry(data=self._data)
+
+        # Preise aus Sensoren (z. B. Tibber, Nordpool) oder input_number
+        price_selector = EntitySelector(
+            EntitySelectorConfig(domain=["sensor", "input_number"], multiple=False)
+        )
+        return self.async_show_form(
+            step_id="tariff",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_PRICE,
+                        default=self._data.get(CONF_PRICE),
+                    ): vol.Maybe(price_selector),
+                    vol.Optional(
+                        CONF_FEED_IN_TARIFF,
+                        default=self._data.get(CONF_FEED_IN_TARIFF),
+                    ): vol.Maybe(price_selector),
+                }
+            ),
+        )
+
+    async def async_step_advanced(self, user_input=None):
+        if user_input is not None:
+            self._data.update(user_input)
+            return self.async_create_entry(data=self._data)
+
+        return self.async_show_form(
+            step_id="advanced",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_DEBOUNCE,
+                        default=self._data.get(CONF_DEBOUNCE, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=500,
+                            step=10,
+                            unit_of_measurement="ms",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_DEADBAND_ABS,
+                        default=self._data.get(CONF_DEADBAND_ABS, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=1000,
+                            step=0.1,
+                            unit_of_measurement="W",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_DEADBAND_REL,
+                        default=self._data.get(CONF_DEADBAND_REL, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=50,
+                            step=0.1,
+                            unit_of_measurement="%",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_PRECISION,
+                        default=self._data.get(CONF_PRECISION, 2),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=3,
+                            step=1,
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_MAX_AGE,
+                        default=self._data.get(CONF_MAX_AGE, 300),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=3600,
+                            step=1,
+                            unit_of_measurement="s",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_MIN_INTERVAL,
+                        default=self._data.get(CONF_MIN_INTERVAL, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=300,
+                            step=0.5,
+                            unit_of_measurement="s",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_MIN_INTERVAL_INPUT,
+                        default=self._data.get(CONF_MIN_INTERVAL_INPUT, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=300,
+                            step=0.5,
+                            unit_of_measurement="s",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_MAX_SOURCE_AGE,
+                        default=self._data.get(CONF_MAX_SOURCE_AGE, 0),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=3600,
+                            step=1,
+                            unit_of_measurement="s",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_STALE_MODE,
+                        default=self._data.get(CONF_STALE_MODE, "halten"),
+                    ): vol.In(STALE_MODES),
+                    vol.Optional(
+                        CONF_INTERPOLATION,
+                        default=self._data.get(CONF_INTERPOLATION, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_ENERGY,
+                        default=self._data.get(CONF_ENERGY, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_PERIOD_COUNTERS,
+                        default=self._data.get(CONF_PERIOD_COUNTERS, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_RATIOS,
+                        default=self._data.get(CONF_RATIOS, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_INTEGRATION_METHOD,
+                        default=self._data.get(CONF_INTEGRATION_METHOD, "trapez"),
+                    ): vol.In(INTEGRATION_METHODS),
+                    vol.Optional(
+                        CONF_STATISTICS,
+                        default=self._data.get(CONF_STATISTICS, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_SNAPSHOT,
+                        default=self._data.get(CONF_SNAPSHOT, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_INSTRUMENTATION,
+                        default=self._data.get(CONF_INSTRUMENTATION, False),
+                    ): bool,
+                }
+            ),
+        )
@@ -1,2 +1,52 @@
 DOMAIN = "power_helper"
-NAME = "powerHELPER"
\ No newline at end of file
+NAME = "powerHELPER"
+
+CONF_TITLE = "title"
+
+CONF_GRID_POWER = "netz_leistung"
+CONF_GRID_IMPORT = "netz_bezug"
+CONF_GRID_EXPORT = "netz_einspeisung"
+CONF_GRID_INVERTED = "netz_invertiert"
+
+CONF_PV_POWER = "pv_leistung"
+
+CONF_BAT_POWER = "akku_leistung"
+CONF_BAT_CHARGE = "akku_laden"
+CONF_BAT_DISCHARGE = "akku_entladen"
+CONF_BAT_PRIO = "akku_prio"
+CONF_BAT_INVERTED = "akku_leistung_invertiert"  # früherer Schalter, nur noch gelesen
+CONF_BAT_INVERTED_DEVICES = "akku_invertiert"
+CONF_BAT_DEVICE_FLOWS = "akku_einzelfluesse"
+
+# Weitere Knoten der Flussbilanz, Reihenfolge der Listen = Priorität
+CONF_PRODUCERS = "erzeuger"
+CONF_CONSUMERS = "verbraucher"
+CONF_CONSUMER_PRIO = "verbraucher_prio"
+
+CONF_DEBOUNCE = "entprellzeit"
+CONF_DEADBAND_ABS = "totband_absolut"
+CONF_DEADBAND_REL = "totband_relativ"
+CONF_PRECISION = "nachkommastellen"
+CONF_MAX_AGE = "max_schreibabstand"
+CONF_MIN_INTERVAL = "min_schreibabstand"
+CONF_MIN_INTERVAL_INPUT = "min_schreibabstand_eingang"
+CONF_MAX_SOURCE_AGE = "max_quellalter"
+CONF_STALE_MODE = "veraltete_quellen"
+CONF_INTERPOLATION = "interpolation"
+CONF_FILTER_LIMIT = "filter_grenze"
+CONF_FILTER_MEDIAN = "filter_median"
+CONF_FILTER_TAU = "filter_zeitkonstante"
+CONF_ENERGY = "energie_sensoren"
+CONF_INTEGRATION_METHOD = "integrationsmethode"
+CONF_INSTRUMENTATION = "instrumentierung"
+CONF_STATISTICS = "statistik_sensoren"
+CONF_SNAPSHOT = "momentaufnahme"
+CONF_PERIOD_COUNTERS = "periodenzaehler"
+CONF_RATIOS = "quoten_sensoren"
+CONF_PRICE = "strompreis"
+CONF_FEED_IN_TARIFF = "einspeiseverguetung"
+
+CONF_PHASES = "phasen"
+# Phasen und je Phase erfassbare Rollen, Optionen z. B. "netz_l1"
+PHASES = ("l1", "l2", "l3")
+PHASE_ROLES = ("netz", "pv", "akku")
@@ -0,0 +1,1217 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    CoreState,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event, async_track_time_interval
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_CONSUMER_PRIO,
+    CONF_CONSUMERS,
+    CONF_FEED_IN_TARIFF,
+    CONF_PHASES,
+    CONF_PRICE,
+    CONF_PRODUCERS,
+    DOMAIN,
+    PHASE_ROLES,
+    PHASES,
+)
+from .engine import (
+    FLOW_KEYS,
+    INPUT_KEYS,
+    FlowInput,
+    FlowResult,
+    balance,
+    node_flows,
+    standard_flows,
+    standard_graph,
+)
+from .filters import SourceFilter, make_filters
+from .hub import async_get_hub
+from .windows import DemandMeter, RollingSum, RollingWindow
+
+# Fensterlängen der rollierenden Statistik in Sekunden
+WINDOW_SPANS = {"1h": 3600, "24h": 86400}
+DEMAND_INTERVAL = 900
+# Kalenderperioden der Periodenzähler
+PERIODS = ("tag", "woche", "monat")
+STORE_VERSION = 1
+STORE_DELAY = 60
+# Energiesummen der Quoten: Haus, Netz -> Haus, PV gesamt und PV selbst genutzt
+RATIO_SUMS = ("haus", "netz_zu_haus", "pv", "pv_eigen")
+RATIO_KEYS = (
+    "autarkie",
+    "autarkie_heute",
+    "autarkie_30d",
+    "eigenverbrauch",
+    "eigenverbrauch_heute",
+    "eigenverbrauch_30d",
+)
+
+# Rollen mit Vorzeichen, alle anderen liefern nur Werte >= 0
+SIGNED_ROLES = frozenset(
+    ("netz", "akku", *(f"{role}_{phase}" for role in ("netz", "akku") for phase in PHASES))
+)
+
+# Kosten- bzw. Erlöszähler -> (Fluss, Option mit der Preis-Entität)
+MONEY_FLOWS = {
+    "netz_zu_haus_kosten": ("netz_zu_haus", CONF_PRICE),
+    "netz_zu_akku_kosten": ("netz_zu_akku", CONF_PRICE),
+    "pv_zu_netz_erloes": ("pv_zu_netz", CONF_FEED_IN_TARIFF),
+    "akku_zu_netz_erloes": ("akku_zu_netz", CONF_FEED_IN_TARIFF),
+}
+# Preis je Energieeinheit -> Faktor auf Preis je kWh
+PRICE_ENERGY_UNITS = {"Wh": 1000.0, "kWh": 1.0, "MWh": 0.001}
+
+# =====================================================================
+# SOURCE CACHE
+# =====================================================================
+
+class SourceCache:
+    """Signed watt values of all sources of one entry, keyed by entity_id.
+
+    The cache is fed incrementally with the values the SourceHub parsed
+    from the event payload, so a recompute never touches the state machine
+    again. Every role (``netz``, ``akku``, ``pv``, ...) may have several
+    entities; their sum is kept up to date with each change instead of
+    being re-added per recompute. The sign of every source is resolved
+    once when the cache is built.
+    """
+
+    def __init__(self, sources: dict[str, list[str]], inverted: set[str]) -> None:
+        self.roles: dict[str, list[str]] = {}
+        for role, entity_ids in sources.items():
+            for entity_id in entity_ids:
+                self.roles.setdefault(entity_id, []).append(role)
+        self.values: dict[str, float] = dict.fromkeys(self.roles, 0.0)
+        self.totals: dict[str, float] = dict.fromkeys(sources, 0.0)
+        self._sign = {e: -1.0 if e in inverted else 1.0 for e in self.roles}
+
+    def update(self, entity_id: str, watt: float) -> bool:
+        """Store a new value of a source; return True if it changed."""
+        value = watt * self._sign[entity_id]
+        old = self.values[entity_id]
+        if value == old:
+            return False
+
+        self.values[entity_id] = value
+        # Summen je Rolle inkrementell nachführen statt alle Quellen neu zu addieren
+        totals = self.totals
+        for role in self.roles[entity_id]:
+            totals[role] += value - old
+        return True
+
+
+# =====================================================================
+# INSTRUMENTATION
+# =====================================================================
+
+class RuntimeStats:
+    """Opt-in counters and callback timings of one entry."""
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.recomputes = 0
+        self.writes = 0
+        self.suppressed = 0
+        # Begrenzter Puffer, Perzentile werden nur bei Abfrage sortiert
+        self.durations: deque[float] = deque(maxlen=1000)
+
+    def percentile(self, p: float) -> float | None:
+        """Return the p-quantile of the recent callback durations in ms."""
+        if not self.durations:
+            return None
+        ordered = sorted(self.durations)
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    def as_dict(self) -> dict[str, float | int | None]:
+        return {
+            "events": self.events,
+            "recomputes": self.recomputes,
+            "writes": self.writes,
+            "suppressed": self.suppressed,
+            "p50_ms": self.percentile(0.50),
+            "p99_ms": self.percentile(0.99),
+        }
+
+
+# =====================================================================
+# COORDINATOR
+# =====================================================================
+
+# Rolle -> Option mit den Quell-Entitäten (eine oder mehrere)
+SOURCE_OPTIONS = {
+    "netz": "netz_leistung",
+    "akku": "akku_leistung",
+    "netz_bezug": "netz_bezug",
+    "netz_einspeisung": "netz_einspeisung",
+    "akku_laden": "akku_laden",
+    "akku_entladen": "akku_entladen",
+    "pv": "pv_leistung",
+    "erzeuger": CONF_PRODUCERS,
+    "verbraucher": CONF_CONSUMERS,
+}
+
+
+def _entity_list(value: str | list[str] | None) -> list[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def read_sources(data: dict) -> tuple[dict[str, list[str]], set[str]]:
+    """Return the source entities per role and the inverted entities.
+
+    In phase mode every phase source is a role of its own (``netz_l1``).
+    A role without a total sensor is fed by the sum of its phases, which
+    gives the balancing (saldierende) total of the meter.
+    """
+    sources = {role: _entity_list(data.get(option)) for role, option in SOURCE_OPTIONS.items()}
+    if data.get(CONF_PHASES, False):
+        for role in PHASE_ROLES:
+            phase_entities = []
+            for phase in PHASES:
+                sources[f"{role}_{phase}"] = _entity_list(data.get(f"{role}_{phase}"))
+                phase_entities += sources[f"{role}_{phase}"]
+            if not sources[role]:
+                sources[role] = phase_entities
+    inverted = set(_entity_list(data.get("netz_invertiert")))
+    inverted.update(_entity_list(data.get("akku_invertiert")))
+    if data.get("akku_leistung_invertiert", False):
+        # Früherer Schalter für einen einzelnen Akku
+        inverted.update(sources["akku"])
+    # Nur vorzeichenbehaftete Gesamtwerte lassen sich invertieren
+    return sources, inverted.intersection(sources["netz"] + sources["akku"])
+
+
+# Optionen, von denen abhängt, welche Entitäten angelegt werden
+_LAYOUT_OPTIONS = (
+    "netz_leistung",
+    "netz_bezug",
+    "netz_einspeisung",
+    "akku_leistung",
+    "akku_laden",
+    "akku_entladen",
+    "pv_leistung",
+    "energie_sensoren",
+    "instrumentierung",
+    "statistik_sensoren",
+    "akku_einzelfluesse",
+    "momentaufnahme",
+    "periodenzaehler",
+    "quoten_sensoren",
+    CONF_PRICE,
+    CONF_FEED_IN_TARIFF,
+    CONF_PHASES,
+    *(f"{role}_{phase}" for role in PHASE_ROLES for phase in PHASES),
+)
+
+
+def _layout(data: dict) -> tuple[bool | int, ...]:
+    layout = tuple(bool(data.get(key)) for key in _LAYOUT_OPTIONS)
+    if data.get("akku_einzelfluesse", False):
+        # Einzelflüsse legen Sensoren je Akku an
+        layout += (len(_entity_list(data.get("akku_leistung"))),)
+    # Je weiterem Erzeuger und Verbraucher eigene Flusssensoren
+    layout += tuple(len(_entity_list(data.get(key))) for key in (CONF_PRODUCERS, CONF_CONSUMERS))
+    return layout
+
+
+def _billing_period(timestamp: float) -> str:
+    """Return the local calendar month of a timestamp, e.g. ``2026-10``."""
+    return dt_util.as_local(dt_util.utc_from_timestamp(timestamp)).strftime("%Y-%m")
+
+
+def _calendar_periods(timestamp: float) -> tuple[dict[str, datetime], float]:
+    """Return the local start of day, week and month and the next midnight."""
+    today = dt_util.as_local(dt_util.utc_from_timestamp(timestamp)).date()
+    starts = {
+        "tag": dt_util.start_of_local_day(today),
+        "woche": dt_util.start_of_local_day(today - timedelta(days=today.weekday())),
+        "monat": dt_util.start_of_local_day(today.replace(day=1)),
+    }
+    return starts, dt_util.start_of_local_day(today + timedelta(days=1)).timestamp()
+
+
+def entry_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store holding the counters of an entry."""
+    return Store(hass, STORE_VERSION, f"{DOMAIN}.{entry_id}")
+
+
+def _parse_price(state: State | None, last: float | None) -> float | None:
+    """Return a price per kWh, or ``last`` if the state is not a valid price.
+
+    The unit of the price entity decides the scaling, e.g. ``EUR/MWh`` or
+    ``ct/kWh``; the result is in the main currency unit per kWh.
+    """
+    if state is None:
+        return last
+    try:
+        value = float(state.state)
+    except ValueError:
+        return last
+    currency, _, energy = (state.attributes.get("unit_of_measurement") or "").partition("/")
+    value *= PRICE_ENERGY_UNITS.get(energy.strip(), 1.0)
+    if currency.strip().lower() in ("ct", "cent", "cents"):
+        value /= 100
+    return value
+
+
+def _share(part: float, whole: float) -> float | None:
+    """Return ``part`` of ``whole`` in percent, None without a whole."""
+    if whole <= 0:
+        return None
+    return min(max(part / whole * 100, 0.0), 100.0)
+
+
+class PowerHelperCoordinator:
+    """Compute all power flows of one config entry once per source event.
+
+    The coordinator receives the parsed source values from the shared
+    SourceHub, keeps them in a SourceCache and pushes the results to the
+    subscribed entities. Nothing is pushed until the coordinator is
+    ``ready``: Home Assistant has started or every source reported a valid
+    state, so a restart does not publish a dip to 0 W.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self.hass = hass
+        self.entry = entry
+        self.flows = FlowResult()
+        self._input = FlowInput()
+        self.energy: dict[str, float] = dict.fromkeys(FLOW_KEYS, 0.0)
+        self._prev_flows: dict[str, float] = dict.fromkeys(FLOW_KEYS, 0.0)
+        self._integrated_at: float | None = None
+        self._event_ts: float | None = None
+        self.updated_at: float | None = None
+        self._flow_listeners: list[Callable[[], None]] = []
+        self._source_listeners: dict[str, list[Callable[[], None]]] = {}
+        self._pending: set[str] = set()
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+        self._hub = async_get_hub(hass)
+        self._unsubs: dict[str, CALLBACK_TYPE] | None = None
+        self._unsub_started: CALLBACK_TYPE | None = None
+        self.ready = False
+        self._option_listeners: list[Callable[[], None]] = []
+
+        data = entry.options or entry.data
+        # Entitäten-Aufbau und Instrumentierung lassen sich nur per Reload ändern
+        self._layout = _layout(data)
+        self.stats = RuntimeStats() if data.get("instrumentierung", False) else None
+        self.windows: dict[str, dict[str, RollingWindow]] | None = None
+        self.demand: DemandMeter | None = None
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._unsub_stale: CALLBACK_TYPE | None = None
+        if data.get("statistik_sensoren", False):
+            self.windows = {
+                key: {label: RollingWindow(span) for label, span in WINDOW_SPANS.items()}
+                for key in FLOW_KEYS
+            }
+            self.demand = DemandMeter(DEMAND_INTERVAL, _billing_period)
+
+        # Periodenzähler und Quoten: ein gemeinsamer, verzögert geschriebener Store je Eintrag
+        self.period_energy: dict[str, dict[str, float]] | None = None
+        self.period_starts: dict[str, datetime] = {}
+        self._period_end = 0.0
+        if data.get("periodenzaehler", False):
+            self.period_energy = {period: dict.fromkeys(FLOW_KEYS, 0.0) for period in PERIODS}
+        self.ratios: dict[str, float | None] | None = None
+        if data.get("quoten_sensoren", False):
+            self.ratios = dict.fromkeys(RATIO_KEYS)
+            self._ratio_day = dict.fromkeys(RATIO_SUMS, 0.0)
+            self._ratio_day_end = 0.0
+            self._ratio_30d = {key: RollingSum(30 * 86400, 30) for key in RATIO_SUMS}
+        # Kosten und Erlöse je Fluss zum jeweils gültigen Preis
+        self.money: dict[str, float] | None = None
+        self._money_flows = [
+            (key, flow, option) for key, (flow, option) in MONEY_FLOWS.items() if data.get(option)
+        ]
+        if self._money_flows:
+            self.money = {key: 0.0 for key, _, _ in self._money_flows}
+        self.prices: dict[str, float | None] = {}
+        self._unsub_prices: CALLBACK_TYPE | None = None
+        self._store: Store | None = None
+        self._save_pending = False
+        if self.period_energy is not None or self.ratios is not None or self.money is not None:
+            self._deltas = dict.fromkeys(FLOW_KEYS, 0.0)
+            self._store = entry_store(hass, entry.entry_id)
+        self._load_options(data)
+
+    def _load_options(self, data: dict) -> None:
+        """Read all options that can change without rebuilding the entities."""
+        self._debounce = float(data.get("entprellzeit", 0)) / 1000
+        self._integrate = data.get("energie_sensoren", False) or self._store is not None
+        self._trapezoidal = data.get("integrationsmethode", "trapez") == "trapez"
+        self._akku_prio = data.get("akku_prio", False)
+        self._sources, inverted = read_sources(data)
+        self.cache = SourceCache(self._sources, inverted)
+
+        # Veraltete Quellen: 0 s schaltet die Prüfung ab
+        self._max_age = float(data.get("max_quellalter", 0))
+        self._stale_mode = data.get("veraltete_quellen", "halten")
+        self._interpolate = data.get("interpolation", False)
+        self.stale: set[str] = set()
+        self.available = True
+        # Letzte zwei Werte je Quelle: (t, Wert, t_vorher, Wert_vorher)
+        self._samples: dict[str, tuple[float, float, float, float]] = {}
+        # Quellen, die nur vorzeichenlose Rollen speisen (PV, Bezug, Einspeisung, ...)
+        self._unsigned = {
+            entity_id
+            for entity_id, roles in self.cache.roles.items()
+            if not any(role in SIGNED_ROLES for role in roles)
+        }
+
+        # Preis-Entitäten der Kosten- und Erlöszähler, Option -> Entität
+        self._tariffs: dict[str, str] = {
+            option: data[option] for option in (CONF_PRICE, CONF_FEED_IN_TARIFF) if data.get(option)
+        }
+
+        # Filterstufe je Quelle, None ohne aktive Filter
+        self._filters: dict[str, SourceFilter] | None = make_filters(self.cache.roles, data)
+
+        # Mehrere Akkus mit Gesamtsensor werden einzeln zugeteilt, sonst ein Knoten
+        batteries = self._sources["akku"] if len(self._sources["akku"]) > 1 else []
+        nodes = [f"akku_{n}" for n in range(1, len(batteries) + 1)] or ["akku"]
+        # Weitere Erzeuger und gemessene Verbraucher in der konfigurierten Reihenfolge
+        producers = [f"erzeuger_{n}" for n in range(1, len(self._sources["erzeuger"]) + 1)]
+        consumers = [f"verbraucher_{n}" for n in range(1, len(self._sources["verbraucher"]) + 1)]
+
+        # Quelle -> Senke Zuteilung, die Fluss-Schlüssel sind Summen von Matrixzellen
+        graph = self._graph = standard_graph(
+            self._akku_prio, nodes, producers, consumers, data.get(CONF_CONSUMER_PRIO, False)
+        )
+        self.matrix = graph.new_matrix()
+        self._cells = [
+            (key, [graph.cell(*pair) for pair in pairs])
+            for key, pairs in standard_flows(nodes, consumers).items()
+        ]
+        loads = ("haus", *consumers)
+        self._battery_cells = []
+        if batteries:
+            for n, node in enumerate(nodes, 1):
+                self._battery_cells += [
+                    (f"pv_zu_akku_{n}", [graph.cell("pv", node)]),
+                    (f"netz_zu_akku_{n}", [graph.cell("netz", node)]),
+                    (f"akku_{n}_zu_haus", [graph.cell(node, load) for load in loads]),
+                    (f"akku_{n}_zu_netz", [graph.cell(node, "netz")]),
+                ]
+        self.battery_flows: dict[str, float] = {key: 0.0 for key, _ in self._battery_cells}
+        self._node_cells = [
+            (key, [graph.cell(*pair) for pair in pairs])
+            for key, pairs in node_flows(producers, consumers, nodes).items()
+        ]
+        self.node_flows: dict[str, float] = {key: 0.0 for key, _ in self._node_cells}
+        self._producer_house_keys = [f"{node}_zu_haus" for node in producers]
+
+        # Positionen der Knoten in Angebot und Nachfrage des Graphen
+        self._house_slot = graph.sinks.index("haus")
+        self._producer_slots = [
+            (entity_id, graph.sources.index(node))
+            for entity_id, node in zip(self._sources["erzeuger"], producers)
+        ]
+        self._consumer_slots = [
+            (entity_id, graph.sinks.index(node))
+            for entity_id, node in zip(self._sources["verbraucher"], consumers)
+        ]
+        self._battery_slots = [
+            (entity_id, graph.sources.index(node), graph.sinks.index(node))
+            for entity_id, node in zip(batteries or [None], nodes)
+        ]
+        self._supply = [0.0] * len(graph.sources)
+        self._demand = [0.0] * len(graph.sinks)
+
+        # Phasenmodus: dieselbe Bilanz je Phase, im selben Recompute
+        self.phases: list[str] = [p for p in PHASES if f"netz_{p}" in self._sources]
+        self.phase_flows: dict[str, FlowResult] = {p: FlowResult() for p in self.phases}
+        self.phase_grid: dict[str, float] = {}
+        if self.phases:
+            self._phase_graph = standard_graph(self._akku_prio)
+            self._phase_cells = [
+                (key, self._phase_graph.cell(*pairs[0])) for key, pairs in standard_flows().items()
+            ]
+            self._phase_matrix = self._phase_graph.new_matrix()
+            self._phase_input = FlowInput()
+            self._phase_roles = [(p, f"netz_{p}", f"pv_{p}", f"akku_{p}") for p in self.phases]
+            self.phase_grid = {"netz_bezug_phasen": 0.0, "netz_einspeisung_phasen": 0.0}
+
+    @property
+    def parse_failures(self) -> int:
+        """Return the number of unparsable states of this entry's sources."""
+        failures = self._hub.parse_failures
+        return sum(failures.get(e, 0) for e in self.source_entities)
+
+    @property
+    def filter_rejects(self) -> dict[str, int]:
+        """Return the samples rejected by the plausibility limit per source."""
+        if self._filters is None:
+            return {}
+        return {entity_id: f.rejected for entity_id, f in self._filters.items() if f.rejected}
+
+    @property
+    def source_entities(self) -> list[str]:
+        """Return all entity ids the flows depend on."""
+        return list(self.cache.roles)
+
+    def matrix_as_dict(self) -> dict[str, dict[str, float]]:
+        """Return the current source -> sink allocation in Watt."""
+        graph = self._graph
+        return {
+            source: dict(zip(graph.sinks, row))
+            for source, row in zip(graph.sources, self.matrix)
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return inputs, flows and the balance residual of the last recompute.
+
+        All values come from the same recompute, so they are consistent with
+        each other. The residual is the part of the house consumption that no
+        flow explains; it is only non-zero for contradicting source values.
+        """
+        flows = self.flows
+        inp = self._input
+        data = {
+            "zeitpunkt": (
+                dt_util.utc_from_timestamp(self.updated_at).isoformat()
+                if self.updated_at is not None
+                else None
+            ),
+            "eingaenge": {key: getattr(inp, key) for key in INPUT_KEYS},
+            "fluesse": flows.as_dict(),
+            "matrix": self.matrix_as_dict(),
+            "residuum": (
+                flows.haus
+                - flows.pv_zu_haus
+                - flows.netz_zu_haus
+                - flows.akku_zu_haus
+                - sum(self.node_flows[key] for key in self._producer_house_keys)
+            ),
+        }
+        if self._battery_cells:
+            data["akku_fluesse"] = dict(self.battery_flows)
+        if self._node_cells:
+            data["knoten_fluesse"] = dict(self.node_flows)
+        if self._max_age > 0:
+            data["veraltet"] = sorted(self.stale)
+        if self.phases:
+            data["phasen"] = {phase: out.as_dict() for phase, out in self.phase_flows.items()}
+            data["phasen"].update(self.phase_grid)
+        return data
+
+    def has_source(self, role: str) -> bool:
+        """Return True if at least one entity feeds the given role."""
+        return bool(self._sources.get(role))
+
+    def value(self, role: str) -> float:
+        """Return the cached value of a source role in Watt.
+
+        Roles with several entities (e.g. two batteries) return their sum.
+        """
+        return self.cache.totals[role]
+
+    async def async_load_store(self) -> None:
+        """Continue the period counters, ratio sums and costs from the store."""
+        if self._store is None:
+            return
+        stored = await self._store.async_load() or {}
+        now = time.time()
+
+        if self.period_energy is not None:
+            self._async_roll_periods(now)
+            for period, start in stored.get("starts", {}).items():
+                if period in self.period_starts and self.period_starts[period].isoformat() == start:
+                    counters = self.period_energy[period]
+                    for key, value in stored["energy"][period].items():
+                        if key in counters:
+                            counters[key] = value
+
+        if self.ratios is not None and (ratios := stored.get("ratios")) is not None:
+            # Tagessummen nur am selben Tag weiterführen
+            if ratios["day_end"] > now:
+                self._ratio_day_end = ratios["day_end"]
+                self._ratio_day.update((k, v) for k, v in ratios["day"].items() if k in self._ratio_day)
+            for key, window in self._ratio_30d.items():
+                if key in ratios["30d"]:
+                    window.restore(ratios["30d"][key])
+
+        if self.money is not None:
+            for key, value in stored.get("money", {}).items():
+                if key in self.money:
+                    self.money[key] = value
+
+    async def async_save_store(self) -> None:
+        """Write pending counters right away, e.g. before a reload."""
+        if self._store is not None and self._save_pending:
+            await self._store.async_save(self._data_to_store())
+
+    @callback
+    def async_restore_energy(self, key: str, value: float) -> None:
+        """Continue an energy counter from its restored state."""
+        self.energy[key] += value
+
+    @callback
+    def async_add_listener(
+        self,
+        update_callback: Callable[[], None],
+        roles: list[str] | None = None,
+    ) -> CALLBACK_TYPE:
+        """Register an entity callback.
+
+        Without ``roles`` the callback runs after every flow recompute,
+        otherwise only when the source of one of the given roles (``netz``,
+        ``akku``, ``pv``, ...) changed.
+        """
+        if self._unsubs is None:
+            self._async_subscribe()
+
+        if roles is None:
+            self._flow_listeners.append(update_callback)
+        else:
+            for role in roles:
+                self._source_listeners.setdefault(role, []).append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            if roles is None:
+                self._flow_listeners.remove(update_callback)
+            else:
+                for role in roles:
+                    self._source_listeners[role].remove(update_callback)
+            if not self._flow_listeners and not any(self._source_listeners.values()):
+                self.async_shutdown()
+
+        return remove_listener
+
+    @callback
+    def async_add_options_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Register a callback that runs when options were applied in place."""
+        self._option_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._option_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_update_options(self) -> bool:
+        """Apply changed options without rebuilding the entities.
+
+        Only the subscriptions of sources that were actually added or
+        removed are touched. Returns False if the change alters the set of
+        entities, in which case the entry has to be reloaded.
+        """
+        data = self.entry.options or self.entry.data
+        if _layout(data) != self._layout:
+            return False
+
+        subscribed = self._unsubs is not None
+        now = time.time()
+        if subscribed and self.ready and self._integrate:
+            # Bisherige Energie noch mit den alten Einstellungen abschließen
+            self._async_integrate(now)
+
+        old = set(self.source_entities)
+        self._load_options(data)
+
+        if subscribed:
+            self._async_track_tick()
+            self._async_track_stale()
+            self._async_track_prices()
+            new = self.source_entities
+            for entity_id in old.difference(new):
+                self._unsubs.pop(entity_id)()
+            for entity_id in new:
+                if entity_id not in old:
+                    self._unsubs[entity_id] = self._hub.async_subscribe(
+                        [entity_id], self._async_source_changed
+                    )
+                self._async_prime(entity_id, now)
+
+        for update_callback in list(self._option_listeners):
+            update_callback()
+
+        if subscribed and self.ready:
+            # Alle Sensoren einmal mit den neuen Einstellungen aktualisieren
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._event_ts = now
+            self._pending.update(self.source_entities)
+            self._async_flush()
+            if self._max_age > 0:
+                self._async_check_stale()
+        return True
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop the source subscriptions and any pending recompute."""
+        if self._unsubs is not None:
+            for unsub in self._unsubs.values():
+                unsub()
+            self._unsubs = None
+        if self._unsub_started is not None:
+            self._unsub_started()
+            self._unsub_started = None
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if self._unsub_stale is not None:
+            self._unsub_stale()
+            self._unsub_stale = None
+        if self._unsub_prices is not None:
+            self._unsub_prices()
+            self._unsub_prices = None
+        self.ready = False
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+
+    @callback
+    def _async_prime(self, entity_id: str, now: float) -> None:
+        """Load the current hub value of a source into the cache."""
+        watt = self._hub.values[entity_id]
+        if self._filters is not None and (watt := self._filters[entity_id].update(watt, now)) is None:
+            return
+        self.cache.update(entity_id, watt)
+
+    @callback
+    def _async_subscribe(self) -> None:
+        self._unsubs = {}
+        for entity_id in self.source_entities:
+            self._unsubs[entity_id] = self._hub.async_subscribe(
+                [entity_id], self._async_source_changed
+            )
+            self._async_prime(entity_id, time.time())
+        self._async_compute()
+
+        self.ready = self._sources_available() or self.hass.state is CoreState.running
+        if self.ready:
+            if self._integrate:
+                self._async_integrate(time.time())
+        else:
+            # Während des HA-Starts auf die Quellen oder das Startende warten
+            self._unsub_started = async_at_started(self.hass, self._async_started)
+
+        self._async_track_tick()
+        self._async_track_stale()
+        self._async_track_prices()
+
+    def _sources_available(self) -> bool:
+        unavailable = self._hub.unavailable
+        return not any(e in unavailable for e in self.source_entities)
+
+    @callback
+    def _async_started(self, _hass: HomeAssistant) -> None:
+        self._unsub_started = None
+        if not self.ready:
+            self._async_set_ready()
+
+    @callback
+    def _async_track_tick(self) -> None:
+        """(Re)start the minute tick for windows and filters."""
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        # Fenster, Lastintervalle und Filter laufen auch ohne Quelländerungen weiter
+        if self.windows is not None or self._filters is not None:
+            self._unsub_tick = async_track_time_interval(
+                self.hass, self._async_tick, timedelta(seconds=60)
+            )
+
+    @callback
+    def _async_tick(self, _now) -> None:
+        if not self.ready:
+            return
+        now = time.time()
+        if self._filters is not None:
+            self._async_refilter(now)
+        if self._flush_handle is not None or (self.windows is None and not self._pending):
+            return
+        self._event_ts = now
+        self._async_flush()
+
+    @callback
+    def _async_refilter(self, now: float) -> None:
+        """Feed the last accepted value of every source into its filter again.
+
+        Home Assistant sends no state change for a repeated value, so
+        without this the median and the moving average would stop short of
+        a new steady value.
+        """
+        hub = self._hub
+        for entity_id, source_filter in self._filters.items():
+            if entity_id in self.stale or entity_id in hub.unavailable:
+                continue
+            watt = source_filter.advance(now)
+            if watt is not None and self.cache.update(entity_id, watt):
+                self._pending.add(entity_id)
+
+    @callback
+    def _async_set_ready(self) -> None:
+        """Publish the first complete snapshot to all entities."""
+        self.ready = True
+        if self._unsub_started is not None:
+            self._unsub_started()
+            self._unsub_started = None
+        self._event_ts = time.time()
+        self._pending.update(self.source_entities)
+        self._async_flush()
+
+    @callback
+    def _async_source_changed(self, entity_id: str, watt: float, timestamp: float) -> None:
+        if (stats := self.stats) is None:
+            self._async_handle_value(entity_id, watt, timestamp)
+            return
+
+        begin = time.perf_counter()
+        stats.events += 1
+        self._async_handle_value(entity_id, watt, timestamp)
+        stats.durations.append(time.perf_counter() - begin)
+
+    @callback
+    def _async_handle_value(self, entity_id: str, watt: float, timestamp: float) -> None:
+        if self._max_age > 0 and self.ready and self._async_handle_stale(entity_id, timestamp):
+            return
+        if self._filters is not None and (watt := self._filters[entity_id].update(watt, timestamp)) is None:
+            return
+        changed = self.cache.update(entity_id, watt)
+        if changed and self._interpolate:
+            value = self.cache.values[entity_id]
+            t0, v0 = self._samples.get(entity_id, (timestamp, value))[:2]
+            self._samples[entity_id] = (timestamp, value, t0, v0)
+        if not self.ready:
+            if self._sources_available():
+                self._async_set_ready()
+            return
+        if not changed:
+            return
+
+        self._event_ts = timestamp
+
+        self._pending.add(entity_id)
+        if self._debounce <= 0:
+            self._async_flush()
+        elif self._flush_handle is None:
+            # Alle Änderungen innerhalb des Fensters ergeben genau eine Berechnung
+            self._flush_handle = self.hass.loop.call_later(self._debounce, self._async_flush_timed)
+
+    # =================================================================
+    # STALE SOURCES
+    # =================================================================
+
+    @callback
+    def _async_track_stale(self) -> None:
+        """(Re)start the periodic check for sources that stopped reporting."""
+        if self._unsub_stale is not None:
+            self._unsub_stale()
+            self._unsub_stale = None
+        if self._max_age > 0:
+            self._unsub_stale = async_track_time_interval(
+                self.hass, self._async_check_stale, timedelta(seconds=max(1.0, self._max_age / 4))
+            )
+
+    @callback
+    def _async_check_stale(self, _now=None) -> None:
+        if not self.ready:
+            return
+        now = time.time()
+        hub = self._hub
+        stale = {
+            entity_id
+            for entity_id in self.cache.roles
+            if entity_id in hub.unavailable or hub.is_stale(entity_id, self._max_age, now)
+        }
+        if stale != self.stale:
+            self._async_set_stale(stale, now)
+
+    @callback
+    def _async_handle_stale(self, entity_id: str, timestamp: float) -> bool:
+        """Apply a change of staleness caused by an event; True if handled."""
+        if entity_id in self._hub.unavailable:
+            # Der Wert einer nicht verfügbaren Quelle wird nie als 0 W übernommen
+            if entity_id not in self.stale:
+                self._async_set_stale(self.stale | {entity_id}, timestamp)
+            return True
+        if entity_id in self.stale:
+            self._async_set_stale(self.stale - {entity_id}, timestamp)
+            return True
+        return False
+
+    @callback
+    def _async_set_stale(self, stale: set[str], now: float) -> None:
+        changed = stale ^ self.stale
+        for entity_id in changed:
+            if entity_id not in stale:
+                self._async_prime(entity_id, now)
+            elif self._stale_mode == "null":
+                self.cache.update(entity_id, 0.0)
+            self._samples.pop(entity_id, None)
+        self.stale = stale
+
+        if self._integrate:
+            # Energie bis hierher mit der bisherigen Verfügbarkeit abschließen
+            self._async_integrate(now)
+        if self._stale_mode == "nicht_verfuegbar":
+            self.available = not stale
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._event_ts = now
+        self._pending.update(changed)
+        self._async_flush()
+
+    # =================================================================
+    # TARIFFS
+    # =================================================================
+
+    @callback
+    def _async_track_prices(self) -> None:
+        """(Re)subscribe the price entities of the cost and revenue counters."""
+        if self._unsub_prices is not None:
+            self._unsub_prices()
+            self._unsub_prices = None
+        if not self._tariffs:
+            return
+        states = self.hass.states
+        for option, entity_id in self._tariffs.items():
+            self.prices[option] = _parse_price(states.get(entity_id), self.prices.get(option))
+        self._unsub_prices = async_track_state_change_event(
+            self.hass, list(set(self._tariffs.values())), self._async_price_changed
+        )
+
+    @callback
+    def _async_price_changed(self, event: Event[EventStateChangedData]) -> None:
+        entity_id = event.data["entity_id"]
+        if self.ready:
+            # Energie bis zum Preiswechsel noch zum alten Preis abrechnen
+            self._async_integrate(event.time_fired_timestamp)
+        for option, tariff_entity in self._tariffs.items():
+            if tariff_entity == entity_id:
+                self.prices[option] = _parse_price(event.data["new_state"], self.prices.get(option))
+
+    def _aligned(self) -> tuple[dict[str, float], dict[str, float]]:
+        """Return every source and role total extrapolated to the newest event.
+
+        Each source continues the slope of its last two samples, at most for
+        one of its own update intervals, so readings taken at different
+        times are combined as if they were taken together. Single sources
+        (e.g. one of several batteries) and the role totals come from the
+        same aligned values, so they stay consistent with each other.
+        Sources of unsigned roles (PV, split import/export) never cross 0 W.
+        """
+        now = self._event_ts or time.time()
+        values = dict(self.cache.values)
+        totals = dict.fromkeys(self.cache.totals, 0.0)
+        samples = self._samples
+        unsigned = self._unsigned
+        for entity_id, roles in self.cache.roles.items():
+            value = values[entity_id]
+            if (sample := samples.get(entity_id)) is not None:
+                t1, v1, t0, v0 = sample
+                span = t1 - t0
+                if span > 0 and now > t1:
+                    value += (v1 - v0) * min(now - t1, span) / span
+                    if entity_id in unsigned and value < 0:
+                        value = 0.0
+                    values[entity_id] = value
+            for role in roles:
+                totals[role] += value
+        return values, totals
+
+    @callback
+    def _async_flush_timed(self) -> None:
+        if (stats := self.stats) is None:
+            self._async_flush()
+            return
+
+        begin = time.perf_counter()
+        self._async_flush()
+        stats.durations.append(time.perf_counter() - begin)
+
+    @callback
+    def _async_flush(self) -> None:
+        self._flush_handle = None
+        if self.stats is not None:
+            self.stats.recomputes += 1
+        pending, self._pending = self._pending, set()
+
+        # Sensoren mit mehreren Quellen (z. B. Combined) nur einmal aktualisieren
+        callbacks: dict[Callable[[], None], None] = {}
+        roles = self.cache.roles
+        for entity_id in pending:
+            for role in roles.get(entity_id, ()):
+                for update_callback in self._source_listeners.get(role, ()):
+                    callbacks[update_callback] = None
+        for update_callback in callbacks:
+            update_callback()
+
+        self._async_compute()
+        now = self._event_ts or time.time()
+        self.updated_at = now
+        if self._integrate:
+            self._async_integrate(now)
+        if self.windows is not None:
+            self._async_update_windows(now)
+        if self.ratios is not None:
+            self._async_update_ratios()
+        for update_callback in list(self._flow_listeners):
+            update_callback()
+
+    @callback
+    def _async_compute(self) -> None:
+        if self._interpolate:
+            values, totals = self._aligned()
+        else:
+            values, totals = self.cache.values, self.cache.totals
+        inp = self._input
+
+        # Snapshot in-place befüllen, keine Allokation pro Event
+        inp.netz = totals["netz"]
+        inp.pv = totals["pv"]
+        inp.akku = totals["akku"]
+        inp.netz_bezug = totals["netz_bezug"]
+        inp.netz_einspeisung = totals["netz_einspeisung"]
+        inp.akku_laden = totals["akku_laden"]
+        inp.akku_entladen = totals["akku_entladen"]
+
+        # Knoten: Quellen pv, erzeuger, akku(s), netz / Senken haus, verbraucher, akku(s), netz
+        haus, pv, al, ae = balance(inp)
+        supply = self._supply
+        demand = self._demand
+        supply[0] = pv
+        for entity_id, i in self._producer_slots:
+            value = values[entity_id]
+            supply[i] = value if value > 0 else 0.0
+            # Weitere Erzeuger speisen das Haus zusätzlich zu Netz, PV und Akku
+            haus += supply[i]
+        # Gemessene Verbraucher sind Teil des Hausverbrauchs, höchstens bis zu diesem
+        rest = haus
+        for entity_id, j in self._consumer_slots:
+            value = min(values[entity_id], rest)
+            demand[j] = value if value > 0 else 0.0
+            rest -= demand[j]
+        demand[self._house_slot] = rest
+        for entity_id, i, j in self._battery_slots:
+            if entity_id is None:
+                supply[i] = ae
+                demand[j] = al
+            else:
+                value = values[entity_id]
+                supply[i] = value if value > 0 else 0.0
+                demand[j] = -value if value < 0 else 0.0
+        matrix = self._graph.solve(supply, demand, self.matrix)
+
+        flows = self.flows
+        flows.haus = haus
+        for key, cells in self._cells:
+            setattr(flows, key, sum(matrix[i][j] for i, j in cells))
+        if self._battery_cells:
+            battery_flows = self.battery_flows
+            for key, cells in self._battery_cells:
+                battery_flows[key] = sum(matrix[i][j] for i, j in cells)
+        if self._node_cells:
+            node_flows = self.node_flows
+            for key, cells in self._node_cells:
+                node_flows[key] = sum(matrix[i][j] for i, j in cells)
+        if self.phases:
+            self._async_compute_phases(totals)
+
+    @callback
+    def _async_compute_phases(self, totals: dict[str, float]) -> None:
+        inp = self._phase_input
+        graph = self._phase_graph
+        matrix = self._phase_matrix
+        grid_import = grid_export = 0.0
+
+        for phase, netz, pv, akku in self._phase_roles:
+            inp.netz = totals[netz]
+            inp.pv = totals[pv]
+            inp.akku = totals[akku]
+            haus, pv_w, al, ae = balance(inp)
+            graph.solve((pv_w, ae, 0.0), (haus, al, 0.0), matrix)
+
+            out = self.phase_flows[phase]
+            out.haus = haus
+            for key, (i, j) in self._phase_cells:
+                setattr(out, key, matrix[i][j])
+
+            # Ohne Saldierung: Bezug und Einspeisung je Phase getrennt aufsummiert
+            if inp.netz > 0:
+                grid_import += inp.netz
+            else:
+                grid_export -= inp.netz
+
+        self.phase_grid["netz_bezug_phasen"] = grid_import
+        self.phase_grid["netz_einspeisung_phasen"] = grid_export
+
+    @callback
+    def _async_integrate(self, now: float) -> None:
+        """Integrate all flows up to ``now`` into the kWh counters."""
+        last = self._integrated_at
+        if last is not None and now < last:
+            # Älterer Zeitstempel, z. B. entprellte Berechnung nach einem Preiswechsel:
+            # bis ``last`` ist schon gezählt, nur die neuen Flüsse übernehmen
+            now = last
+        self._integrated_at = now
+        prev = self._prev_flows
+
+        # Flüsse aus veralteten Quellen zählen nicht als Energie
+        if last is not None and now > last and self.available:
+            hours = (now - last) / 3600
+            energy = self.energy
+            counting = self._store is not None
+            for key in FLOW_KEYS:
+                # Zähler dürfen nicht fallen (TOTAL_INCREASING)
+                value = max(getattr(self.flows, key), 0)
+                if self._trapezoidal:
+                    delta = (prev[key] + value) / 2 * hours / 1000
+                else:
+                    delta = prev[key] * hours / 1000
+                energy[key] += delta
+                if counting:
+                    self._deltas[key] = delta
+            if self.period_energy is not None:
+                self._async_count_periods(last, now)
+            if self.ratios is not None:
+                self._async_count_ratios(now)
+            if self.money is not None:
+                self._async_count_money()
+            if counting and not self._save_pending:
+                self._save_pending = True
+                self._store.async_delay_save(self._data_to_store, STORE_DELAY)
+
+        for key in FLOW_KEYS:
+            prev[key] = max(getattr(self.flows, key), 0)
+
+    @callback
+    def _async_count_periods(self, last: float, now: float) -> None:
+        """Add the last integration step to the day, week and month counters."""
+        if now >= self._period_end:
+            self._async_roll_periods(now)
+        deltas = self._deltas
+        for period, counters in self.period_energy.items():
+            # Schritt über eine Periodengrenze: nur der Anteil seit Periodenbeginn zählt,
+            # auch wenn der Schritt mehrere Tage umfasst
+            start = self.period_starts[period].timestamp()
+            share = 1.0 if start <= last else (now - start) / (now - last)
+            for key, delta in deltas.items():
+                counters[key] += delta * share
+
+    @callback
+    def _async_roll_periods(self, now: float) -> None:
+        """Start new periods at the calendar boundaries that were crossed."""
+        starts, self._period_end = _calendar_periods(now)
+        for period, start in starts.items():
+            if self.period_starts.get(period) != start:
+                self.period_starts[period] = start
+                counters = self.period_energy[period]
+                for key in counters:
+                    counters[key] = 0.0
+
+    @callback
+    def _async_count_ratios(self, now: float) -> None:
+        """Add the last integration step to the energy sums of the ratios."""
+        deltas = self._deltas
+        pv_own = deltas["pv_zu_haus"] + deltas["pv_zu_akku"]
+        amounts = (
+            ("haus", deltas["haus"]),
+            ("netz_zu_haus", deltas["netz_zu_haus"]),
+            ("pv", pv_own + deltas["pv_zu_netz"]),
+            ("pv_eigen", pv_own),
+        )
+
+        day = self._ratio_day
+        if now >= self._ratio_day_end:
+            _, self._ratio_day_end = _calendar_periods(now)
+            for key in day:
+                day[key] = 0.0
+        windows = self._ratio_30d
+        for key, amount in amounts:
+            day[key] += amount
+            windows[key].add(now, amount)
+
+    @callback
+    def _async_count_money(self) -> None:
+        """Bill the last integration step at the prices valid during it.
+
+        Every price change closes an integration step first, so the price is
+        constant within a step and the sum is the time-weighted price x power.
+        """
+        deltas = self._deltas
+        prices = self.prices
+        money = self.money
+        for key, flow, option in self._money_flows:
+            # Ohne gültigen Preis bisher wird der Schritt nicht bewertet
+            if (price := prices.get(option)) is not None:
+                money[key] += deltas[flow] * price
+
+    @callback
+    def _async_update_ratios(self) -> None:
+        """Derive autarky and self-consumption from the flows and energy sums."""
+        flows = self.flows
+        ratios = self.ratios
+        ratios["autarkie"] = _share(flows.haus - flows.netz_zu_haus, flows.haus)
+        ratios["eigenverbrauch"] = _share(
+            flows.pv_zu_haus + flows.pv_zu_akku,
+            flows.pv_zu_haus + flows.pv_zu_akku + flows.pv_zu_netz,
+        )
+        for suffix, sums in (
+            ("heute", self._ratio_day),
+            ("30d", {key: window.total for key, window in self._ratio_30d.items()}),
+        ):
+            ratios[f"autarkie_{suffix}"] = _share(sums["haus"] - sums["netz_zu_haus"], sums["haus"])
+            ratios[f"eigenverbrauch_{suffix}"] = _share(sums["pv_eigen"], sums["pv"])
+
+    @callback
+    def _data_to_store(self) -> dict[str, Any]:
+        self._save_pending = False
+        data: dict[str, Any] = {}
+        if self.period_energy is not None:
+            data["starts"] = {period: start.isoformat() for period, start in self.period_starts.items()}
+            data["energy"] = {period: dict(counters) for period, counters in self.period_energy.items()}
+        if self.ratios is not None:
+            data["ratios"] = {
+                "day_end": self._ratio_day_end,
+                "day": dict(self._ratio_day),
+                "30d": {key: window.as_dict() for key, window in self._ratio_30d.items()},
+            }
+        if self.money is not None:
+            data["money"] = dict(self.money)
+        return data
+
+    @callback
+    def _async_update_windows(self, now: float) -> None:
+        """Feed the current flows and the grid import into the statistics."""
+        flows = self.flows
+        for key, windows in self.windows.items():
+            value = getattr(flows, key)
+            for window in windows.values():
+                window.update(now, value)
+
+        # Abgerechnet wird der Netzbezug laut Zähler, nicht der Flussanteil
+        inp = self._input
+        if inp.netz_bezug or inp.netz_einspeisung:
+            grid_import = inp.netz_bezug
+        else:
+            grid_import = max(inp.netz, 0.0)
+        self.demand.update(now, grid_import)
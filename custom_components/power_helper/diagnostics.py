@@ -0,0 +1,34 @@
+"""Diagnostics support for powerHELPER."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+
+    return {
+        "options": dict(entry.options or entry.data),
+        "sources": dict(coordinator.cache.values),
+        "flows": coordinator.flows.as_dict(),
+        "matrix": coordinator.matrix_as_dict(),
+        "battery_flows": dict(coordinator.battery_flows),
+        "node_flows": dict(coordinator.node_flows),
+        "phase_flows": {phase: flows.as_dict() for phase, flows in coordinator.phase_flows.items()},
+        "phase_grid": dict(coordinator.phase_grid),
+        "energy": dict(coordinator.energy),
+        "prices": dict(coordinator.prices),
+        "money": dict(coordinator.money) if coordinator.money is not None else None,
+        "parse_failures": coordinator.parse_failures,
+        "stale": sorted(coordinator.stale),
+        "filter_rejects": coordinator.filter_rejects,
+        "stats": coordinator.stats.as_dict() if coordinator.stats is not None else None,
+    }
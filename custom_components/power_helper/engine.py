@@ -0,0 +1,375 @@
+"""Power flow balance of powerHELPER, independent of Home Assistant.
+
+The same engine is used by the live sensors (flow graph, one snapshot per
+update) and by offline tools such as the backfill service (batch path over
+NumPy arrays). The scalar path is the fixed grid/PV/battery topology the
+flow graph reproduces exactly.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+import math
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FLOW_KEYS = (
+    "haus",
+    "pv_zu_haus",
+    "pv_zu_akku",
+    "pv_zu_netz",
+    "netz_zu_haus",
+    "netz_zu_akku",
+    "akku_zu_haus",
+    "akku_zu_netz",
+)
+
+INPUT_KEYS = (
+    "netz",
+    "pv",
+    "akku",
+    "netz_bezug",
+    "netz_einspeisung",
+    "akku_laden",
+    "akku_entladen",
+)
+
+
+# =====================================================================
+# SNAPSHOT TYPES
+# =====================================================================
+
+class FlowInput:
+    """Input snapshot of one balance in Watt.
+
+    ``netz`` and ``akku`` are signed totals (positive: grid consumption /
+    battery discharging); the split fields are positive magnitudes. Unused
+    fields stay 0.
+    """
+
+    __slots__ = INPUT_KEYS
+
+    def __init__(
+        self,
+        netz: float = 0.0,
+        pv: float = 0.0,
+        akku: float = 0.0,
+        netz_bezug: float = 0.0,
+        netz_einspeisung: float = 0.0,
+        akku_laden: float = 0.0,
+        akku_entladen: float = 0.0,
+    ) -> None:
+        self.netz = netz
+        self.pv = pv
+        self.akku = akku
+        self.netz_bezug = netz_bezug
+        self.netz_einspeisung = netz_einspeisung
+        self.akku_laden = akku_laden
+        self.akku_entladen = akku_entladen
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in INPUT_KEYS)
+        return f"FlowInput({fields})"
+
+
+class FlowResult:
+    """All eight flows of one balance in Watt."""
+
+    __slots__ = FLOW_KEYS
+
+    def __init__(self) -> None:
+        self.haus = 0.0
+        self.pv_zu_haus = 0.0
+        self.pv_zu_akku = 0.0
+        self.pv_zu_netz = 0.0
+        self.netz_zu_haus = 0.0
+        self.netz_zu_akku = 0.0
+        self.akku_zu_haus = 0.0
+        self.akku_zu_netz = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the flows keyed by their sensor key."""
+        return {k: getattr(self, k) for k in FLOW_KEYS}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in FLOW_KEYS)
+        return f"FlowResult({fields})"
+
+
+# =====================================================================
+# SCALAR PATH
+# =====================================================================
+
+def balance(inp: FlowInput) -> tuple[float, float, float, float]:
+    """Return house consumption, PV, battery charging and discharging.
+
+    Totals and split values complete each other: a signed total fills the
+    missing split values and vice versa.
+    """
+    netz = inp.netz
+    akku = inp.akku
+    nb = inp.netz_bezug
+    ne = inp.netz_einspeisung
+    al = inp.akku_laden
+    ae = inp.akku_entladen
+
+    if netz == 0 and (nb != 0 or ne != 0):
+        netz = nb - ne
+
+    if akku != 0 and al == 0 and ae == 0:
+        ae = max(akku, 0)
+        al = max(-akku, 0)
+
+    if akku == 0 and (al != 0 or ae != 0):
+        akku = ae - al
+
+    return netz + inp.pv + akku, inp.pv, al, ae
+
+
+def compute_flows(
+    inp: FlowInput,
+    akku_prio: bool = False,
+    out: FlowResult | None = None,
+) -> FlowResult:
+    """Compute all flows of one snapshot.
+
+    Pass a preallocated ``out`` to update it in place; the live sensors
+    reuse one result object for the lifetime of the entry.
+    """
+    if out is None:
+        out = FlowResult()
+
+    haus, pv, al, ae = balance(inp)
+
+    if akku_prio:
+        pv_zu_akku = max(min(pv, al), 0)
+        pv_zu_haus = max(min(max(pv - pv_zu_akku, 0), haus), 0)
+    else:
+        pv_zu_haus = max(min(pv, haus), 0)
+        pv_zu_akku = max(min(max(pv - pv_zu_haus, 0), al), 0)
+
+    akku_zu_haus = max(min(ae, haus - pv_zu_haus), 0)
+
+    # Abzug in Zuteilungsreihenfolge, damit FlowGraph bitgenau gleich rechnet
+    if akku_prio:
+        pv_zu_netz = max(pv - pv_zu_akku - pv_zu_haus, 0)
+    else:
+        pv_zu_netz = max(pv - pv_zu_haus - pv_zu_akku, 0)
+
+    out.haus = haus
+    out.pv_zu_haus = pv_zu_haus
+    out.pv_zu_akku = pv_zu_akku
+    out.pv_zu_netz = pv_zu_netz
+    out.netz_zu_haus = max(haus - pv_zu_haus - akku_zu_haus, 0)
+    out.netz_zu_akku = max(al - pv_zu_akku, 0)
+    out.akku_zu_haus = akku_zu_haus
+    out.akku_zu_netz = max(ae - akku_zu_haus, 0)
+    return out
+
+
+# =====================================================================
+# FLOW GRAPH
+# =====================================================================
+
+GRID = "netz"
+
+class FlowGraph:
+    """Greedy priority allocation between any number of sources and sinks.
+
+    Sources are visited in priority order; each one fills the remaining
+    demand of the sinks in its own sink order. The grid node is the slack
+    of the balance: as a source it covers whatever demand is left, as a
+    sink it takes whatever supply is left. A node that is both source and
+    sink (a battery) never supplies itself. Solving costs O(sources x sinks)
+    and allocates nothing when an output matrix is passed in.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[str],
+        sinks: Sequence[str],
+        sink_order: Mapping[str, Sequence[str]] | None = None,
+    ) -> None:
+        self.sources = tuple(sources)
+        self.sinks = tuple(sinks)
+        index = {name: j for j, name in enumerate(self.sinks)}
+        sink_order = sink_order or {}
+        self._order = tuple(
+            tuple(index[sink] for sink in sink_order.get(source, self.sinks) if sink != source)
+            for source in self.sources
+        )
+        self._slack_sources = tuple(source == GRID for source in self.sources)
+        self._slack_sinks = tuple(j for j, sink in enumerate(self.sinks) if sink == GRID)
+        self._remaining = [0.0] * len(self.sinks)
+
+    def new_matrix(self) -> list[list[float]]:
+        """Return a zeroed source x sink matrix."""
+        return [[0.0] * len(self.sinks) for _ in self.sources]
+
+    def cell(self, source: str, sink: str) -> tuple[int, int]:
+        """Return the matrix position of a source/sink pair."""
+        return self.sources.index(source), self.sinks.index(sink)
+
+    def solve(
+        self,
+        supply: Sequence[float],
+        demand: Sequence[float],
+        out: list[list[float]] | None = None,
+    ) -> list[list[float]]:
+        """Allocate ``supply`` per source to ``demand`` per sink.
+
+        Values given for the grid node are ignored, it balances the rest.
+        """
+        if out is None:
+            out = self.new_matrix()
+
+        remaining = self._remaining
+        remaining[:] = demand
+        for j in self._slack_sinks:
+            remaining[j] = math.inf
+
+        for i, order in enumerate(self._order):
+            row = out[i]
+            left = math.inf if self._slack_sources[i] else supply[i]
+            for j in order:
+                amount = remaining[j] if remaining[j] < left else left
+                if amount > 0:
+                    row[j] = amount
+                    left -= amount
+                    remaining[j] -= amount
+                else:
+                    row[j] = 0.0
+        return out
+
+
+def standard_graph(
+    akku_prio: bool = False,
+    batteries: Sequence[str] = ("akku",),
+    producers: Sequence[str] = (),
+    consumers: Sequence[str] = (),
+    consumer_prio: bool = False,
+) -> FlowGraph:
+    """Return the grid/PV/battery topology of compute_flows as a FlowGraph.
+
+    With several ``batteries`` every battery is a node of its own; a
+    discharging battery may then also charge another one. Additional
+    ``producers`` supply after PV and ``consumers`` are metered parts of
+    the house load, both in the given order. The house node keeps the
+    rest of the load and is served before the consumers unless
+    ``consumer_prio`` is set. Without extra nodes the graph reproduces
+    compute_flows exactly.
+    """
+    batteries = tuple(batteries)
+    loads = (*consumers, "haus") if consumer_prio else ("haus", *consumers)
+    sink_order = {"pv": (*batteries, *loads, "netz")} if akku_prio else None
+    return FlowGraph(
+        ("pv", *producers, *batteries, "netz"),
+        (*loads, *batteries, "netz"),
+        sink_order,
+    )
+
+
+def standard_flows(
+    batteries: Sequence[str] = ("akku",),
+    consumers: Sequence[str] = (),
+) -> dict[str, list[tuple[str, str]]]:
+    """Return the (source, sink) pairs summed into each flow key.
+
+    The house keys cover the whole house load, metered consumers included.
+    """
+    loads = ("haus", *consumers)
+    return {
+        "pv_zu_haus": [("pv", load) for load in loads],
+        "pv_zu_akku": [("pv", b) for b in batteries],
+        "pv_zu_netz": [("pv", "netz")],
+        "netz_zu_haus": [("netz", load) for load in loads],
+        "netz_zu_akku": [("netz", b) for b in batteries],
+        "akku_zu_haus": [(b, load) for b in batteries for load in loads],
+        "akku_zu_netz": [(b, "netz") for b in batteries],
+    }
+
+
+def node_flows(
+    producers: Sequence[str],
+    consumers: Sequence[str],
+    batteries: Sequence[str] = ("akku",),
+) -> dict[str, list[tuple[str, str]]]:
+    """Return the (source, sink) pairs of the flows from and to extra nodes.
+
+    Keys are ``<source>_zu_<sink>``; flows into the house include the
+    metered consumers, all batteries count as one ``akku``.
+    """
+    loads = ("haus", *consumers)
+    flows: dict[str, list[tuple[str, str]]] = {}
+    for producer in producers:
+        flows[f"{producer}_zu_haus"] = [(producer, load) for load in loads]
+        flows[f"{producer}_zu_akku"] = [(producer, b) for b in batteries]
+        flows[f"{producer}_zu_netz"] = [(producer, "netz")]
+    for consumer in consumers:
+        flows[f"pv_zu_{consumer}"] = [("pv", consumer)]
+        for producer in producers:
+            flows[f"{producer}_zu_{consumer}"] = [(producer, consumer)]
+        flows[f"netz_zu_{consumer}"] = [("netz", consumer)]
+        flows[f"akku_zu_{consumer}"] = [(b, consumer) for b in batteries]
+    return flows
+
+
+# =====================================================================
+# BATCH PATH
+# =====================================================================
+
+def compute_flows_batch(
+    netz: np.ndarray,
+    pv: np.ndarray,
+    akku: np.ndarray,
+    nb: np.ndarray,
+    ne: np.ndarray,
+    al: np.ndarray,
+    ae: np.ndarray,
+    akku_prio: bool = False,
+) -> dict[str, np.ndarray]:
+    """Vectorized counterpart of compute_flows over whole arrays."""
+    import numpy as np
+
+    # Gesamtwerte aus getrennten Sensoren bilden und umgekehrt
+    split_netz = (netz != 0) & (nb == 0) & (ne == 0)
+    nb = np.where(split_netz, np.maximum(netz, 0), nb)
+    ne = np.where(split_netz, np.maximum(-netz, 0), ne)
+    netz = np.where((netz == 0) & ((nb != 0) | (ne != 0)), nb - ne, netz)
+
+    split_akku = (akku != 0) & (al == 0) & (ae == 0)
+    ae = np.where(split_akku, np.maximum(akku, 0), ae)
+    al = np.where(split_akku, np.maximum(-akku, 0), al)
+    akku = np.where((akku == 0) & ((al != 0) | (ae != 0)), ae - al, akku)
+
+    haus = netz + pv + akku
+
+    if akku_prio:
+        pv_zu_akku = np.maximum(np.minimum(pv, al), 0)
+        pv_zu_haus = np.maximum(np.minimum(np.maximum(pv - pv_zu_akku, 0), haus), 0)
+    else:
+        pv_zu_haus = np.maximum(np.minimum(pv, haus), 0)
+        pv_zu_akku = np.maximum(np.minimum(np.maximum(pv - pv_zu_haus, 0), al), 0)
+
+    if akku_prio:
+        pv_zu_netz = np.maximum(pv - pv_zu_akku - pv_zu_haus, 0)
+    else:
+        pv_zu_netz = np.maximum(pv - pv_zu_haus - pv_zu_akku, 0)
+
+    akku_zu_haus = np.maximum(np.minimum(ae, haus - pv_zu_haus), 0)
+    akku_zu_netz = np.maximum(ae - akku_zu_haus, 0)
+
+    netz_zu_haus = np.maximum(haus - pv_zu_haus - akku_zu_haus, 0)
+    netz_zu_akku = np.maximum(al - pv_zu_akku, 0)
+
+    return {
+        "haus": haus,
+        "pv_zu_haus": pv_zu_haus,
+        "pv_zu_akku": pv_zu_akku,
+        "pv_zu_netz": pv_zu_netz,
+        "netz_zu_haus": netz_zu_haus,
+        "netz_zu_akku": netz_zu_akku,
+        "akku_zu_haus": akku_zu_haus,
+        "akku_zu_netz": akku_zu_netz,
+    }
@@ -0,0 +1,90 @@
+"""Input filters of powerHELPER, independent of Home Assistant.
+
+A filter runs once per source update in the cached input path, before the
+value reaches the balance. Every filter keeps a fixed amount of state, so
+an update costs the same no matter how long a source has been running:
+O(N log N) for a median of N values (sorted per sample, N <= 9 in the
+options), O(1) for the limit and the moving average.
+"""
+from __future__ import annotations
+
+import math
+
+
+# =====================================================================
+# SOURCE FILTER
+# =====================================================================
+
+class SourceFilter:
+    """Plausibility limit, rolling median and EMA of one source, in this order.
+
+    * ``limit``   values with a magnitude above it are rejected, the source
+                  keeps its last value (e.g. 65535 W from a Modbus meter)
+    * ``median``  median of the last N accepted values, removes single
+                  spikes and sign flips at the cost of (N - 1) / 2 samples lag;
+                  until N values arrived the lower middle value is used
+    * ``tau``     time constant of an exponential moving average in seconds,
+                  weighted by the time between updates
+
+    A parameter of 0 (median: 1) disables its stage.
+    """
+
+    __slots__ = ("limit", "tau", "_ring", "_pos", "_count", "_t", "_raw", "value", "rejected")
+
+    def __init__(self, *, limit: float = 0.0, median: int = 1, tau: float = 0.0) -> None:
+        self.limit = limit
+        self.tau = tau
+        self._ring = [0.0] * max(median, 1)
+        self._pos = 0
+        self._count = 0
+        self._t: float | None = None
+        self._raw: float | None = None
+        self.value: float | None = None
+        self.rejected = 0
+
+    def update(self, value: float, t: float) -> float | None:
+        """Filter a new sample taken at ``t``; return None if it was rejected."""
+        if self.limit > 0 and abs(value) > self.limit:
+            self.rejected += 1
+            return None
+        self._raw = value
+
+        ring = self._ring
+        size = len(ring)
+        if size > 1:
+            ring[self._pos] = value
+            self._pos = (self._pos + 1) % size
+            if self._count < size:
+                self._count += 1
+            # Untere Mitte: beim Anlaufen (gerade Anzahl) kommt keine halbe Spitze durch
+            value = sorted(ring[: self._count])[(self._count - 1) // 2]
+
+        last = self.value
+        if self.tau > 0 and last is not None:
+            # Unregelmäßige Abtastung: Gewicht aus dem Abstand zum letzten Wert,
+            # ohne Abstand (gleicher oder älterer Zeitstempel) kein Gewicht
+            elapsed = t - self._t if t > self._t else 0.0
+            value = last + (value - last) * (1 - math.exp(-elapsed / self.tau))
+
+        if self._t is None or t > self._t:
+            self._t = t
+        self.value = value
+        return value
+
+    def advance(self, t: float) -> float | None:
+        """Repeat the last accepted sample at ``t``, as its source still reports it."""
+        if self._raw is None:
+            return None
+        return self.update(self._raw, t)
+
+
+def make_filters(entity_ids, data: dict) -> dict[str, SourceFilter] | None:
+    """Return one filter per source, or None if no filter stage is enabled."""
+    limit = float(data.get("filter_grenze", 0))
+    median = int(data.get("filter_median", 1))
+    tau = float(data.get("filter_zeitkonstante", 0))
+    if limit <= 0 and median <= 1 and tau <= 0:
+        return None
+    return {
+        entity_id: SourceFilter(limit=limit, median=median, tau=tau) for entity_id in entity_ids
+    }
@@ -0,0 +1,159 @@
+"""Domain-wide source dispatcher shared by all powerHELPER entries."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.const import UnitOfPower
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+_KW_UNITS = (UnitOfPower.KILO_WATT, "kW")
+
+# action(entity_id, watt, timestamp)
+SourceAction = Callable[[str, float, float], None]
+
+
+class SourceHub:
+    """Own one state-change subscription per distinct source entity.
+
+    Every source state is parsed and normalized to Watt exactly once and
+    the value is fanned out to all interested coordinators, so several
+    entries sharing a grid meter or inverter cost one subscription and one
+    parse per update instead of one per entry.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.values: dict[str, float] = {}
+        self.parse_failures: dict[str, int] = {}
+        # Zeitpunkt der letzten Meldung je Quelle (Unix-Zeit)
+        self.updated: dict[str, float] = {}
+        # Quellen ohne gültigen Zustand (fehlend, unknown, unavailable)
+        self.unavailable: set[str] = set()
+        self._actions: dict[str, list[SourceAction]] = {}
+        self._unsubs: dict[str, CALLBACK_TYPE] = {}
+        self._unit: dict[str, str | None] = {}
+        self._factor: dict[str, float] = {}
+
+    @callback
+    def async_subscribe(self, entity_ids: list[str], action: SourceAction) -> CALLBACK_TYPE:
+        """Deliver normalized values of the given sources to ``action``."""
+        for entity_id in entity_ids:
+            if entity_id not in self._actions:
+                self._actions[entity_id] = []
+                state = self.hass.states.get(entity_id)
+                self._update_availability(entity_id, state)
+                self.values[entity_id] = self._parse(entity_id, state)
+                self.updated[entity_id] = state.last_reported_timestamp if state is not None else 0.0
+                self._unsubs[entity_id] = async_track_state_change_event(
+                    self.hass, [entity_id], self._async_source_changed
+                )
+            self._actions[entity_id].append(action)
+
+        @callback
+        def unsubscribe() -> None:
+            for entity_id in entity_ids:
+                actions = self._actions[entity_id]
+                actions.remove(action)
+                if not actions:
+                    # Letzter Interessent weg: Abo und Zwischenstände freigeben
+                    self._unsubs.pop(entity_id)()
+                    del self._actions[entity_id]
+                    self.values.pop(entity_id, None)
+                    self.updated.pop(entity_id, None)
+                    self.unavailable.discard(entity_id)
+                    self._unit.pop(entity_id, None)
+                    self._factor.pop(entity_id, None)
+
+        return unsubscribe
+
+    @callback
+    def async_replace_action(self, old: SourceAction, new: SourceAction) -> None:
+        """Swap a subscribed action in place, e.g. for a temporary wrapper."""
+        for actions in self._actions.values():
+            for index, action in enumerate(actions):
+                if action is old or action == old:
+                    actions[index] = new
+
+    @property
+    def subscription_count(self) -> int:
+        """Return the number of distinct subscribed sources."""
+        return len(self._unsubs)
+
+    @callback
+    def _async_source_changed(self, event: Event[EventStateChangedData]) -> None:
+        entity_id = event.data["entity_id"]
+        state = event.data["new_state"]
+        value = self._parse(entity_id, state)
+        timestamp = event.time_fired_timestamp
+        self.updated[entity_id] = timestamp
+        # Auch ein Wechsel unknown -> 0 W zählt, die Coordinators warten darauf
+        if not self._update_availability(entity_id, state) and value == self.values.get(entity_id):
+            return
+
+        self.values[entity_id] = value
+        for action in list(self._actions.get(entity_id, ())):
+            action(entity_id, value, timestamp)
+
+    def is_stale(self, entity_id: str, max_age: float, now: float) -> bool:
+        """Return True if the source did not report for more than ``max_age`` seconds.
+
+        A source that reports the same value again only updates its
+        ``last_reported`` time without a state change event, so the state
+        machine is consulted before a source is declared stale.
+        """
+        if now - self.updated.get(entity_id, 0.0) <= max_age:
+            return False
+        if (state := self.hass.states.get(entity_id)) is None or state.state in ("unknown", "unavailable"):
+            return True
+        self.updated[entity_id] = max(self.updated.get(entity_id, 0.0), state.last_reported_timestamp)
+        return now - self.updated[entity_id] > max_age
+
+    def _update_availability(self, entity_id: str, state: State | None) -> bool:
+        """Track whether a source has a valid state; return True on a change."""
+        missing = state is None or state.state in ("unknown", "unavailable")
+        if missing == (entity_id in self.unavailable):
+            return False
+        if missing:
+            self.unavailable.add(entity_id)
+        else:
+            self.unavailable.discard(entity_id)
+        return True
+
+    def _parse(self, entity_id: str, state: State | None) -> float:
+        if state is None or state.state in ("unknown", "unavailable"):
+            return 0.0
+        try:
+            value = float(state.state)
+        except ValueError:
+            self.parse_failures[entity_id] = self.parse_failures.get(entity_id, 0) + 1
+            _LOGGER.debug("Ignoring non-numeric state %r of %s", state.state, entity_id)
+            return 0.0
+
+        unit = state.attributes.get("unit_of_measurement")
+        if entity_id not in self._unit or self._unit[entity_id] != unit:
+            self._unit[entity_id] = unit
+            self._factor[entity_id] = 1000.0 if unit in _KW_UNITS else 1.0
+
+        return value * self._factor[entity_id]
+
+
+@callback
+def async_get_hub(hass: HomeAssistant) -> SourceHub:
+    """Return the shared SourceHub, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (hub := domain_data.get("hub")) is None:
+        hub = domain_data["hub"] = SourceHub(hass)
+    return hub
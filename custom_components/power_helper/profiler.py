@@ -0,0 +1,190 @@
+"""On-demand profiling of the powerHELPER hot path.
+
+Nothing here runs unless the ``power_helper.profile`` service is called.
+For the duration of a session the source actions of the selected entries
+are swapped in the SourceHub for timed wrappers, and the debounced flush is
+shadowed on the coordinator instance; afterwards the original callables are
+put back, so an inactive profiler costs nothing.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .coordinator import PowerHelperCoordinator
+from .hub import async_get_hub
+
+# Nur Funktionen dieser Integration im Bericht
+_PACKAGE = "power_helper"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+
+class _Probe:
+    """Profile and measure one callable; compares equal to it.
+
+    The equality keeps ``list.remove(original)`` in the hub working if an
+    entry unsubscribes while a session is running.
+    """
+
+    __slots__ = ("func", "session", "flush")
+
+    def __init__(self, func, session: ProfileSession, *, flush: bool = False) -> None:
+        self.func = func
+        self.session = session
+        self.flush = flush
+
+    def __call__(self, *args):
+        return self.session.run(self.func, args, self.flush)
+
+    def __eq__(self, other) -> bool:
+        return other is self or other == self.func
+
+    def __hash__(self) -> int:
+        return hash(self.func)
+
+
+class ProfileSession:
+    """cProfile and tracemalloc measurements of the selected entries."""
+
+    def __init__(self, hass: HomeAssistant, coordinators: list[PowerHelperCoordinator]) -> None:
+        self.hass = hass
+        self.coordinators = coordinators
+        self.profiler = cProfile.Profile()
+        # Quellereignisse und entprellte Berechnungen getrennt zählen
+        self.events = 0
+        self.flushes = 0
+        self.duration = 0.0
+        self.allocated = 0
+        self._probes: list[tuple[PowerHelperCoordinator, _Probe]] = []
+        self._own_tracing = False
+        self._snapshot: tracemalloc.Snapshot | None = None
+
+    def run(self, func, args, flush: bool):
+        if flush:
+            self.flushes += 1
+        else:
+            self.events += 1
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        begin = time.perf_counter()
+        self.profiler.enable()
+        try:
+            return func(*args)
+        finally:
+            self.profiler.disable()
+            self.duration += time.perf_counter() - begin
+            self.allocated += tracemalloc.get_traced_memory()[1] - current
+
+    @callback
+    def async_start(self) -> None:
+        self._own_tracing = not tracemalloc.is_tracing()
+        if self._own_tracing:
+            tracemalloc.start(10)
+        self._snapshot = tracemalloc.take_snapshot()
+
+        hub = async_get_hub(self.hass)
+        for coordinator in self.coordinators:
+            probe = _Probe(coordinator._async_source_changed, self)
+            hub.async_replace_action(coordinator._async_source_changed, probe)
+            self._probes.append((coordinator, probe))
+            # Entprellte Berechnungen laufen über einen Timer am Coordinator
+            coordinator._async_flush_timed = _Probe(
+                coordinator._async_flush_timed, self, flush=True
+            )
+
+    @callback
+    def async_stop(self) -> tracemalloc.Snapshot:
+        hub = async_get_hub(self.hass)
+        for coordinator, probe in self._probes:
+            hub.async_replace_action(probe, probe.func)
+            coordinator.__dict__.pop("_async_flush_timed", None)
+        self._probes.clear()
+
+        snapshot = tracemalloc.take_snapshot()
+        if self._own_tracing:
+            tracemalloc.stop()
+        return snapshot
+
+    def report(self, seconds: float, snapshot: tracemalloc.Snapshot) -> str:
+        """Return the text report; runs in the executor."""
+        out = io.StringIO()
+        out.write(
+            f"powerHELPER profile, {seconds:.0f} s, {self.events} events,"
+            f" {self.flushes} debounced recomputes\n"
+        )
+        out.write(f"callback time {self.duration * 1e3:.1f} ms")
+        # Kosten je Quellereignis, entprellte Berechnungen eingerechnet
+        if self.events:
+            out.write(
+                f", {self.duration / self.events * 1e6:.1f} µs/event"
+                f", {self.allocated / self.events:.0f} B allocated/event"
+            )
+        out.write("\n\n")
+
+        if self.events or self.flushes:
+            stats = pstats.Stats(self.profiler, stream=out)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_PACKAGE, TOP_FUNCTIONS)
+
+        out.write("Allocations retained during the session\n")
+        filters = [tracemalloc.Filter(True, f"*{_PACKAGE}*")]
+        diff = snapshot.filter_traces(filters).compare_to(
+            self._snapshot.filter_traces(filters), "lineno"
+        )
+        for stat in diff[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+    def summary(self) -> dict[str, Any]:
+        top = []
+        # pstats lehnt ein Profil ohne Aufrufe ab
+        if self.events or self.flushes:
+            top = sorted(
+                (
+                    (f"{func[0].rsplit('/', 1)[-1]}:{func[1]}({func[2]})", calls, cumulative)
+                    for func, (_, calls, _, cumulative, _) in pstats.Stats(self.profiler).stats.items()
+                    if _PACKAGE in func[0]
+                ),
+                key=lambda item: item[2],
+                reverse=True,
+            )[:5]
+        return {
+            "events": self.events,
+            "flushes": self.flushes,
+            "callback_ms": round(self.duration * 1e3, 3),
+            "us_per_event": round(self.duration / self.events * 1e6, 1) if self.events else None,
+            "bytes_per_event": round(self.allocated / self.events) if self.events else None,
+            "top": [
+                {"function": name, "calls": calls, "cumulative_ms": round(cumulative * 1e3, 3)}
+                for name, calls, cumulative in top
+            ],
+        }
+
+
+async def async_profile(
+    hass: HomeAssistant, coordinators: list[PowerHelperCoordinator], seconds: float
+) -> dict[str, Any]:
+    """Profile the entries for ``seconds`` and write a report to the config dir."""
+    session = ProfileSession(hass, coordinators)
+    session.async_start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        snapshot = session.async_stop()
+
+    path = hass.config.path(f"power_helper_profile_{dt_util.now().strftime('%Y%m%d_%H%M%S')}.txt")
+
+    def _write() -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(session.report(seconds, snapshot))
+
+    await hass.async_add_executor_job(_write)
+    return {"report": path, **session.summary()}
@@ -0,0 +1,359 @@
+"""Replay recorded meter readings through the powerHELPER flow engine.
+
+Runs a CSV (or Parquet / Arrow when pyarrow is installed) log of
+timestamped grid, PV and battery readings through the same balance as
+the live sensors, chunk by chunk with constant memory, and writes all
+flows plus the integrated energy (kWh) of every flow.
+
+Home Assistant is not required::
+
+    python custom_components/power_helper/replay.py log.csv -o flows.csv \\
+        --zeit time --netz grid --pv pv1 --pv pv2:kW --akku battery --akku-prio
+
+Every source column can carry its unit as ``column:W`` or ``column:kW``;
+``--einheit`` sets the default. Empty cells keep the last known value.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from datetime import datetime
+import math
+import sys
+import time
+from typing import IO, Iterator
+
+try:
+    from .engine import FLOW_KEYS, FlowInput, FlowResult, compute_flows, compute_flows_batch
+except ImportError:  # als Skript gestartet, ohne Paket-Kontext
+    from engine import FLOW_KEYS, FlowInput, FlowResult, compute_flows, compute_flows_batch
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - reiner Python-Pfad
+    np = None
+
+# Rollen in der Reihenfolge der Argumente von compute_flows_batch
+ROLES = (
+    "netz",
+    "pv",
+    "akku",
+    "netz_bezug",
+    "netz_einspeisung",
+    "akku_laden",
+    "akku_entladen",
+)
+
+UNITS = {"w": 1.0, "kw": 1000.0}
+
+
+# =====================================================================
+# OPTIONS
+# =====================================================================
+
+class Column:
+    __slots__ = ("name", "factor")
+
+    def __init__(self, spec: str, default_factor: float) -> None:
+        name, _, unit = spec.rpartition(":")
+        if name and unit.lower() in UNITS:
+            self.name = name
+            self.factor = UNITS[unit.lower()]
+        else:
+            self.name = spec
+            self.factor = default_factor
+
+
+def build_columns(args: argparse.Namespace) -> dict[str, list[Column]]:
+    """Map every role to its source columns with their unit factor."""
+    default = UNITS[args.einheit.lower()]
+    columns = {role: [] for role in ROLES}
+    for role in ROLES:
+        specs = getattr(args, role) or []
+        if isinstance(specs, str):
+            specs = [specs]
+        columns[role] = [Column(spec, default) for spec in specs]
+
+    if args.akku_invertiert:
+        for column in columns["akku"]:
+            column.factor = -column.factor
+    return columns
+
+
+def parse_time(value: str) -> float:
+    """Return epoch seconds from a number or an ISO 8601 timestamp."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+# =====================================================================
+# READERS
+# =====================================================================
+
+def _is_arrow(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".arrow", ".feather", ".ipc"))
+
+
+def iter_arrow_chunks(
+    path: str, time_column: str, names: list[str], chunk_size: int
+) -> Iterator[tuple[np.ndarray, dict[str, np.ndarray]]]:
+    """Stream record batches of a CSV / Parquet / Arrow file via pyarrow."""
+    import pyarrow as pa
+
+    wanted = [time_column, *names]
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=wanted)
+    elif _is_arrow(path):
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (
+            reader.get_batch(i).select(wanted) for i in range(reader.num_record_batches)
+        )
+    else:
+        from pyarrow import csv as pa_csv
+
+        batches = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=1 << 24),
+            convert_options=pa_csv.ConvertOptions(include_columns=wanted),
+        )
+
+    for batch in batches:
+        times = batch.column(time_column)
+        if pa.types.is_timestamp(times.type):
+            scale = {"s": 1, "ms": 1e3, "us": 1e6, "ns": 1e9}[times.type.unit]
+            ts = times.cast(pa.int64()).to_numpy(zero_copy_only=False) / scale
+        elif pa.types.is_string(times.type) or pa.types.is_large_string(times.type):
+            ts = np.fromiter((parse_time(v) for v in times.to_pylist()), float, len(times))
+        else:
+            ts = times.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+        values = {
+            name: batch.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            for name in names
+        }
+        yield ts, values
+
+
+def iter_csv_chunks(
+    path: str, time_column: str, names: list[str], chunk_size: int
+) -> Iterator[tuple[list[float], dict[str, list[float]]]]:
+    """Stream a CSV file in chunks with the standard library only."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        reader = csv.DictReader(fh)
+        ts: list[float] = []
+        values: dict[str, list[float]] = {name: [] for name in names}
+        for row in reader:
+            ts.append(parse_time(row[time_column]))
+            for name in names:
+                cell = row.get(name)
+                values[name].append(float(cell) if cell not in (None, "") else math.nan)
+            if len(ts) >= chunk_size:
+                yield ts, values
+                ts = []
+                values = {name: [] for name in names}
+        if ts:
+            yield ts, values
+
+
+# =====================================================================
+# REPLAY
+# =====================================================================
+
+class Replay:
+    """Stateful chunk processor; carries the last values across chunks."""
+
+    def __init__(self, columns: dict[str, list[Column]], akku_prio: bool, trapezoidal: bool) -> None:
+        self.columns = columns
+        self.akku_prio = akku_prio
+        self.trapezoidal = trapezoidal
+        self.rows = 0
+        self.energy = dict.fromkeys(FLOW_KEYS, 0.0)
+        self._carry: dict[str, float] = {
+            c.name: 0.0 for cols in columns.values() for c in cols
+        }
+        self._last_ts: float | None = None
+        self._last_flows = dict.fromkeys(FLOW_KEYS, 0.0)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._carry)
+
+    # ==================== NUMPY ====================
+
+    def _ffill(self, name: str, values: np.ndarray) -> np.ndarray:
+        """Fill empty cells with the last known value, also across chunks."""
+        if not len(values):
+            return values
+        valid = ~np.isnan(values)
+        if valid.all():
+            self._carry[name] = float(values[-1])
+            return values
+        index = np.where(valid, np.arange(len(values)), -1)
+        np.maximum.accumulate(index, out=index)
+        filled = np.where(index >= 0, values[np.maximum(index, 0)], self._carry[name])
+        self._carry[name] = float(filled[-1])
+        return filled
+
+    def process_batch(self, ts: np.ndarray, raw: dict[str, np.ndarray]) -> tuple[np.ndarray, dict[str, np.ndarray], dict[str, np.ndarray]]:
+        size = len(ts)
+        filled = {name: self._ffill(name, np.asarray(raw[name], dtype=float)) for name in raw}
+
+        inputs = []
+        for role in ROLES:
+            total = np.zeros(size)
+            for column in self.columns[role]:
+                total += filled[column.name] * column.factor
+            inputs.append(total)
+
+        flows = compute_flows_batch(*inputs, akku_prio=self.akku_prio)
+
+        # Zeitdifferenzen inkl. Übergang vom vorherigen Chunk
+        prev_ts = ts[0] if self._last_ts is None else self._last_ts
+        hours = np.diff(ts, prepend=prev_ts) / 3600
+        np.maximum(hours, 0, out=hours)
+
+        kwh = {}
+        for key in FLOW_KEYS:
+            current = np.maximum(flows[key], 0)
+            previous = np.concatenate(([self._last_flows[key]], current[:-1]))
+            if self.trapezoidal:
+                step = (previous + current) / 2 * hours / 1000
+            else:
+                step = previous * hours / 1000
+            kwh[key] = self.energy[key] + np.cumsum(step)
+            self.energy[key] = float(kwh[key][-1])
+            self._last_flows[key] = float(current[-1])
+
+        self._last_ts = float(ts[-1])
+        self.rows += size
+        return ts, flows, kwh
+
+    # ==================== PURE PYTHON ====================
+
+    def process_rows(self, ts: list[float], raw: dict[str, list[float]]) -> Iterator[list[float]]:
+        inp = FlowInput()
+        out = FlowResult()
+        carry = self._carry
+        for i, t in enumerate(ts):
+            for name, values in raw.items():
+                if not math.isnan(values[i]):
+                    carry[name] = values[i]
+            for role in ROLES:
+                setattr(
+                    inp,
+                    role,
+                    sum(carry[c.name] * c.factor for c in self.columns[role]),
+                )
+            compute_flows(inp, self.akku_prio, out)
+
+            hours = 0.0 if self._last_ts is None else max(t - self._last_ts, 0) / 3600
+            row = [t]
+            for key in FLOW_KEYS:
+                current = max(getattr(out, key), 0)
+                previous = self._last_flows[key]
+                step = (previous + current) / 2 if self.trapezoidal else previous
+                self.energy[key] += step * hours / 1000
+                self._last_flows[key] = current
+                row.append(getattr(out, key))
+            row.extend(self.energy[key] for key in FLOW_KEYS)
+            self._last_ts = t
+            self.rows += 1
+            yield row
+
+
+# =====================================================================
+# CLI
+# =====================================================================
+
+def _header() -> list[str]:
+    return ["zeit", *FLOW_KEYS, *(f"{key}_kwh" for key in FLOW_KEYS)]
+
+
+def run(args: argparse.Namespace, out: IO[str]) -> Replay:
+    columns = build_columns(args)
+    if not any(columns[role] for role in ("netz", "netz_bezug")):
+        raise SystemExit("--netz or --netz-bezug/--netz-einspeisung is required")
+
+    replay = Replay(columns, args.akku_prio, args.methode == "trapez")
+    names = replay.names
+    out.write(",".join(_header()) + "\n")
+
+    use_arrow = False
+    if np is not None:
+        try:
+            import pyarrow  # noqa: F401
+            use_arrow = True
+        except ImportError:
+            if _is_arrow(args.input):
+                raise SystemExit("pyarrow is required for Parquet / Arrow input")
+
+    if np is None:
+        count = len(FLOW_KEYS)
+        for ts, raw in iter_csv_chunks(args.input, args.zeit, names, args.chunk):
+            for row in replay.process_rows(ts, raw):
+                out.write(
+                    f"{row[0]:.3f},"
+                    + ",".join(f"{v:.2f}" for v in row[1 : count + 1])
+                    + ","
+                    + ",".join(f"{v:.6f}" for v in row[count + 1 :])
+                    + "\n"
+                )
+        return replay
+
+    fmt = ["%.3f"] + ["%.2f"] * len(FLOW_KEYS) + ["%.6f"] * len(FLOW_KEYS)
+    chunks = (
+        iter_arrow_chunks(args.input, args.zeit, names, args.chunk)
+        if use_arrow
+        else iter_csv_chunks(args.input, args.zeit, names, args.chunk)
+    )
+    for ts, raw in chunks:
+        ts, flows, kwh = replay.process_batch(np.asarray(ts, dtype=float), raw)
+        table = np.column_stack(
+            [ts, *(flows[k] for k in FLOW_KEYS), *(kwh[k] for k in FLOW_KEYS)]
+        )
+        np.savetxt(out, table, fmt=fmt, delimiter=",")
+    return replay
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay meter logs through the powerHELPER flow engine."
+    )
+    parser.add_argument("input", help="CSV, Parquet or Arrow file")
+    parser.add_argument("-o", "--output", help="output CSV (default: stdout)")
+    parser.add_argument("--zeit", default="timestamp", help="time column (epoch s or ISO 8601)")
+    parser.add_argument("--netz", help="grid power column (+ consumption / - feed-in)")
+    parser.add_argument("--netz-bezug", dest="netz_bezug", help="grid consumption column")
+    parser.add_argument("--netz-einspeisung", dest="netz_einspeisung", help="grid feed-in column")
+    parser.add_argument("--pv", action="append", help="PV power column, repeatable")
+    parser.add_argument("--akku", help="battery power column (+ discharging / - charging)")
+    parser.add_argument("--akku-laden", dest="akku_laden", help="battery charging column")
+    parser.add_argument("--akku-entladen", dest="akku_entladen", help="battery discharging column")
+    parser.add_argument("--akku-invertiert", action="store_true", help="invert the battery power sign")
+    parser.add_argument("--akku-prio", action="store_true", help="PV charges the battery first")
+    parser.add_argument("--einheit", default="W", choices=["W", "kW"], help="default unit of all columns")
+    parser.add_argument("--methode", default="trapez", choices=["trapez", "links"], help="integration method")
+    parser.add_argument("--chunk", type=int, default=1 << 16, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    begin = time.perf_counter()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            replay = run(args, out)
+    else:
+        replay = run(args, sys.stdout)
+    elapsed = time.perf_counter() - begin
+
+    print(f"{replay.rows} rows in {elapsed:.1f} s", file=sys.stderr)
+    for key in FLOW_KEYS:
+        print(f"{key:>14}: {replay.energy[key]:12.3f} kWh", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
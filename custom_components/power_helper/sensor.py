@@ -1,77 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+from datetime import timedelta
+import time
+
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorEntity,
     SensorDeviceClass,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.entity import DeviceInfo, EntityCategory
-from homeassistant.const import UnitOfPower
+from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower
+from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN
-
-# =====================================================================
-# HELPERS
-# =====================================================================
-
-def power_in_watt(hass: HomeAssistant, entry: ConfigEntry, entity_id: str) -> float:
-    """Return power in Watt, normalized from W / kW."""
-    data = entry.options or entry.data
-    try:
-        state = hass.states.get(entity_id)
-        if state is None or state.state in (None, "unknown", "unavailable"):
-            return 0.0
-
-        value = float(state.state)
-        unit = state.attributes.get("unit_of_measurement")
-
-        if unit in (UnitOfPower.KILO_WATT, "kW"):
-            return value * 1000
-        
-        # Akku-Invertierung
-        if entity_id == data.get("akku_leistung"):
-            invert = data.get("akku_leistung_invertiert", False)
-            if invert:
-                return -value
-
-        return value
-    except Exception:
-        return 0.0
-
-def sum_pv_power(hass: HomeAssistant, entry: ConfigEntry) -> float:
-    """Return the sum of all PV sensors in Watt."""
-    data = entry.options or entry.data
-    pv_sensors = data.get("pv_leistung")
-
-    if not pv_sensors:
-        return 0.0
-
-    # Falls nur ein einzelner Sensor angegeben wurde, in eine Liste packen
-    if isinstance(pv_sensors, str):
-        pv_sensors = [pv_sensors]
-
-    total = 0.0
-    for sensor_id in pv_sensors:
-        try:
-            state = hass.states.get(sensor_id)
-            if state is None or state.state in (None, "unknown", "unavailable"):
-                continue
-
-            value = float(state.state)
-            unit = state.attributes.get("unit_of_measurement")
-
-            if unit in (UnitOfPower.KILO_WATT, "kW"):
-                value *= 1000
-
-            total += value
-        except Exception:
-            continue
-
-    return total
-
+from .coordinator import MONEY_FLOWS, WINDOW_SPANS, PowerHelperCoordinator
 
 # =====================================================================
 # SETUP
@@ -80,37 +27,36 @@ def sum_pv_power(hass: HomeAssistant, entry: ConfigEntry) -> float:
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     sensors: list[SensorEntity] = []
     data = entry.options or entry.data
+    coordinator: PowerHelperCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
 
     # ==================== GRID ====================
 
-    if data.get("netz_leistung") and not (data.get("netz_bezug") and data.get("netz_einspeisung")):
+    # Im Phasenmodus ohne Gesamtsensor zählt die Summe der Phasen
+    if coordinator.has_source("netz") and not (data.get("netz_bezug") and data.get("netz_einspeisung")):
         sensors += [
-            ProxyPowerSensor(hass, source_entity=data["netz_leistung"], entry=entry, key="netz_leistung"),
+            ProxyPowerSensor(coordinator, source="netz", key="netz_leistung"),
             SplitPowerSensor(
-                hass,
-                source_entity=data["netz_leistung"],
-                entry=entry,
+                coordinator,
+                source="netz",
                 key="netz_bezug",
                 positive=True,
             ),
             SplitPowerSensor(
-                hass,
-                source_entity=data["netz_leistung"],
-                entry=entry,
+                coordinator,
+                source="netz",
                 key="netz_einspeisung",
                 positive=False,
             ),
         ]
 
-    if not data.get("netz_leistung") and (data.get("netz_bezug") and data.get("netz_einspeisung")):
+    if not coordinator.has_source("netz") and (data.get("netz_bezug") and data.get("netz_einspeisung")):
         sensors += [
-            ProxyPowerSensor(hass, source_entity=data["netz_bezug"], entry=entry, key="netz_bezug"),
-            ProxyPowerSensor(hass, source_entity=data["netz_einspeisung"], entry=entry, key="netz_einspeisung"),
+            ProxyPowerSensor(coordinator, source="netz_bezug", key="netz_bezug"),
+            ProxyPowerSensor(coordinator, source="netz_einspeisung", key="netz_einspeisung"),
             CombinedPowerSensor(
-                hass,
-                pos_entity=data["netz_bezug"],
-                neg_entity=data["netz_einspeisung"],
-                entry=entry,
+                coordinator,
+                pos="netz_bezug",
+                neg="netz_einspeisung",
                 key="netz_leistung",
                 ena_def=True,
             ),
@@ -118,43 +64,39 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 
     # ==================== BATTERY ====================
 
-    if data.get("akku_leistung") and not (data.get("akku_laden") and data.get("akku_entladen")):
+    if coordinator.has_source("akku") and not (data.get("akku_laden") and data.get("akku_entladen")):
         sensors += [
-            ProxyPowerSensor(hass, source_entity=data["akku_leistung"], entry=entry, key="akku_leistung"),
-            InvertedPowerSensor(hass, source_entity=data["akku_leistung"], entry=entry, key="akku_leistung_inv"),
+            ProxyPowerSensor(coordinator, source="akku", key="akku_leistung"),
+            InvertedPowerSensor(coordinator, source="akku", key="akku_leistung_inv"),
             SplitPowerSensor(
-                hass,
-                source_entity=data["akku_leistung"],
-                entry=entry,
+                coordinator,
+                source="akku",
                 key="akku_entladen",
                 positive=True,
             ),
             SplitPowerSensor(
-                hass,
-                source_entity=data["akku_leistung"],
-                entry=entry,
+                coordinator,
+                source="akku",
                 key="akku_laden",
                 positive=False,
             ),
         ]
 
-    if not data.get("akku_leistung") and (data.get("akku_laden") and data.get("akku_entladen")):
+    if not coordinator.has_source("akku") and (data.get("akku_laden") and data.get("akku_entladen")):
         sensors += [
-            ProxyPowerSensor(hass, source_entity=data["akku_laden"], entry=entry, key="akku_laden"),
-            ProxyPowerSensor(hass, source_entity=data["akku_entladen"], entry=entry, key="akku_entladen"),
+            ProxyPowerSensor(coordinator, source="akku_laden", key="akku_laden"),
+            ProxyPowerSensor(coordinator, source="akku_entladen", key="akku_entladen"),
             CombinedPowerSensor(
-                hass,
-                pos_entity=data["akku_entladen"],
-                neg_entity=data["akku_laden"],
-                entry=entry,
+                coordinator,
+                pos="akku_entladen",
+                neg="akku_laden",
                 key="akku_leistung",
                 ena_def=True
             ),
             CombinedPowerSensor(
-                hass,
-                pos_entity=data["akku_laden"],
-                neg_entity=data["akku_entladen"],
-                entry=entry,
+                coordinator,
+                pos="akku_laden",
+                neg="akku_entladen",
                 key="akku_leistung_inv",
                 ena_def=False
             ),
@@ -162,31 +104,103 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
 
     # ==================== FLOWS ====================
 
-    flows = {
-        "netz": data.get("netz_leistung"),
-        "akku": data.get("akku_leistung"),
-        "netz_bezug": data.get("netz_bezug"),
-        "netz_einspeisung": data.get("netz_einspeisung"),
-        "akku_laden": data.get("akku_laden"),
-        "akku_entladen": data.get("akku_entladen"),
-    }
+    flow_keys = ["haus"]
+    has_akku = coordinator.has_source("akku") or (data.get("akku_laden") and data.get("akku_entladen"))
+
+    if coordinator.has_source("pv"):
+        sensors.append(ProxyPvSumPowerSensor(coordinator, key="pv_leistung"))
+        flow_keys += ["pv_zu_haus", "pv_zu_netz"]
 
-    sensors.append(FlowPowerSensor(hass, entry, "haus", flows))
+        if has_akku:
+            flow_keys.append("pv_zu_akku")
 
-    if data.get("pv_leistung"):
-        sensors.append(ProxyPvSumPowerSensor(hass, entry=entry, key="pv_leistung"))
-        sensors.append(FlowPowerSensor(hass, entry, "pv_zu_haus", flows))
-        sensors.append(FlowPowerSensor(hass, entry, "pv_zu_netz", flows))
+    flow_keys.append("netz_zu_haus")
 
-        if data.get("akku_leistung") or (data.get("akku_laden") and data.get("akku_entladen")):
-            sensors.append(FlowPowerSensor(hass, entry, "pv_zu_akku", flows))
+    if has_akku:
+        flow_keys += ["netz_zu_akku", "akku_zu_haus", "akku_zu_netz"]
 
-    sensors.append(FlowPowerSensor(hass, entry, "netz_zu_haus", flows))
+    sensors += [FlowPowerSensor(coordinator, key) for key in flow_keys]
 
-    if data.get("akku_leistung") or (data.get("akku_laden") and data.get("akku_entladen")):
-        sensors.append(FlowPowerSensor(hass, entry, "netz_zu_akku", flows))
-        sensors.append(FlowPowerSensor(hass, entry, "akku_zu_haus", flows))
-        sensors.append(FlowPowerSensor(hass, entry, "akku_zu_netz", flows))
+    # Flüsse je Akku, nur bei mehreren Akkus mit Gesamtsensor
+    if data.get("akku_einzelfluesse", False):
+        sensors += [
+            BatteryFlowPowerSensor(coordinator, key)
+            for key in coordinator.battery_flows
+            if coordinator.has_source("pv") or not key.startswith("pv_")
+        ]
+
+    # Flüsse von und zu weiteren Erzeugern und Verbrauchern
+    sensors += [
+        NodeFlowPowerSensor(coordinator, key)
+        for key in coordinator.node_flows
+        if (coordinator.has_source("pv") or not key.startswith("pv_"))
+        and (has_akku or "akku" not in key)
+    ]
+
+    # ==================== PHASES ====================
+
+    if coordinator.phases:
+        sensors += [PhaseGridSensor(coordinator, key=key) for key in coordinator.phase_grid]
+        # Je Phase dieselben Flüsse wie gesamt, standardmäßig deaktiviert
+        sensors += [
+            PhaseFlowPowerSensor(coordinator, key, phase)
+            for phase in coordinator.phases
+            for key in flow_keys
+        ]
+
+    # ==================== ENERGY ====================
+
+    if data.get("energie_sensoren", False):
+        sensors += [FlowEnergySensor(coordinator, key) for key in flow_keys]
+
+    if coordinator.period_energy is not None:
+        sensors += [
+            PeriodEnergySensor(coordinator, flow_key=key, period=period)
+            for key in flow_keys
+            for period in coordinator.period_energy
+        ]
+
+    # ==================== COSTS ====================
+
+    if coordinator.money is not None:
+        sensors += [
+            MoneySensor(coordinator, key=key)
+            for key in coordinator.money
+            if MONEY_FLOWS[key][0] in flow_keys
+        ]
+
+    # ==================== RATIOS ====================
+
+    if coordinator.ratios is not None:
+        sensors += [
+            RatioSensor(coordinator, key=key)
+            for key in coordinator.ratios
+            if coordinator.has_source("pv") or not key.startswith("eigenverbrauch")
+        ]
+
+    # ==================== STATISTICS ====================
+
+    if coordinator.windows is not None:
+        sensors += [
+            DemandSensor(coordinator, key="netz_bezug_15min"),
+            DemandPeakSensor(coordinator, key="netz_bezug_spitze"),
+        ]
+        sensors += [
+            WindowSensor(coordinator, flow_key=key, stat=stat, span=span)
+            for key in flow_keys
+            for span in WINDOW_SPANS
+            for stat in ("min", "max", "mittel")
+        ]
+
+    # ==================== SNAPSHOT ====================
+
+    if data.get("momentaufnahme", False):
+        sensors.append(SnapshotSensor(coordinator, key="momentaufnahme"))
+
+    # ==================== DIAGNOSTICS ====================
+
+    if coordinator.stats is not None:
+        sensors.append(DiagnosticsSensor(coordinator, key="diagnose"))
 
     async_add_entities(sensors)
 
@@ -202,8 +216,16 @@ class BasePhSensor(SensorEntity):
     _attr_native_unit_of_measurement = UnitOfPower.WATT
     _attr_icon = "mdi:lightning-bolt-circle"
     _attr_has_entity_name = True
-
-    def __init__(self, *, entry: ConfigEntry, key: str):
+    # Flusssensoren werden bei veralteten Quellen ggf. nicht verfügbar
+    _follows_sources = False
+    # Eingangssensoren haben ein eigenes Schreibbudget
+    _input_sensor = False
+    # Leistungen werden bei Schreibbudget zeitgewichtet gemittelt, Zähler nicht
+    _average = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, *, key: str):
+        entry = coordinator.entry
+        self._coordinator = coordinator
         self._entry = entry
         self._attr_translation_key = key
         self._attr_unique_id = f"{DOMAIN}_{entry.entry_id}_{key}"
@@ -215,194 +237,678 @@ class BasePhSensor(SensorEntity):
             sw_version="1.0.7",
         )
 
+        self._written_at: float | None = None
+        self._written_available = True
+        # Zeitgewichtetes Mittel der Werte seit dem letzten Schreiben
+        self._held: float | None = None
+        self._held_at = 0.0
+        self._window_start = 0.0
+        self._integral = 0.0
+        self._budget_handle: asyncio.TimerHandle | None = None
+        self._load_options()
+
+    @property
+    def available(self) -> bool:
+        return self._coordinator.available or not self._follows_sources
+
+    async def async_added_to_hass(self):
+        # Rundung und Totband ändern sich ohne Reload, siehe async_update_options
+        self.async_on_remove(self._coordinator.async_add_options_listener(self._async_options_changed))
+        self.async_on_remove(self._async_cancel_budget)
+
+    @callback
+    def _async_options_changed(self) -> None:
+        self._load_options()
+        if self._budget <= 0 and self._held is not None:
+            # Ohne Budget: gehaltenen Wert noch schreiben, offenes Fenster verwerfen
+            self._async_cancel_budget()
+            held, self._held = self._held, None
+            self._integral = 0.0
+            self._async_write(held)
+
+    @callback
+    def _load_options(self) -> None:
+        data = self._entry.options or self._entry.data
+        self._precision = int(data.get("nachkommastellen", 2))
+        self._deadband_abs = float(data.get("totband_absolut", 0))
+        self._deadband_rel = float(data.get("totband_relativ", 0)) / 100
+        self._max_age = float(data.get("max_schreibabstand", 300))
+        budget = "min_schreibabstand_eingang" if self._input_sensor else "min_schreibabstand"
+        self._budget = float(data.get(budget, 0))
+
+    @callback
+    def _async_publish(self, value: float) -> None:
+        """Publish a new value within the write budget of the entity.
+
+        With a minimum write interval, values arriving in between are held
+        back and the next write carries their time-weighted average, so
+        downstream energy integrations see the same energy as with every
+        sample written.
+        """
+        if self._budget <= 0:
+            self._async_write(value)
+            return
+
+        now = time.monotonic()
+        due = self._written_at is None or now - self._written_at >= self._budget
+        if self._held is None or (due and self._budget_handle is None):
+            # Das letzte Fenster ist schon geschrieben: neues Fenster ab diesem Wert,
+            # sonst ginge ein Sprung nach einer Pause im Mittel über die Pause unter
+            self._window_start = now
+            self._integral = 0.0
+        else:
+            self._integral += self._held * (now - self._held_at)
+        self._held = value
+        self._held_at = now
+
+        if due:
+            self._async_write_average(now)
+            return
+        if (stats := self._coordinator.stats) is not None:
+            stats.suppressed += 1
+        if self._budget_handle is None:
+            self._budget_handle = self.hass.loop.call_later(
+                self._written_at + self._budget - now, self._async_budget_due
+            )
+
+    @callback
+    def _async_budget_due(self) -> None:
+        self._budget_handle = None
+        if self._held is None:
+            return
+        now = time.monotonic()
+        self._integral += self._held * (now - self._held_at)
+        self._held_at = now
+        self._async_write_average(now)
+
+    @callback
+    def _async_write_average(self, now: float) -> None:
+        if self._budget_handle is not None:
+            self._budget_handle.cancel()
+            self._budget_handle = None
+        duration = now - self._window_start
+        value = self._integral / duration if self._average and duration > 0 else self._held
+        self._integral = 0.0
+        self._window_start = now
+        self._async_write(value)
+        if round(value, self._precision) != round(self._held, self._precision):
+            # Das Mittel enthielt noch ältere Werte: der gehaltene folgt nach einem Intervall
+            self._budget_handle = self.hass.loop.call_later(self._budget, self._async_budget_due)
+
+    @callback
+    def _async_cancel_budget(self) -> None:
+        if self._budget_handle is not None:
+            self._budget_handle.cancel()
+            self._budget_handle = None
+
+    @callback
+    def _async_write(self, value: float) -> None:
+        """Write the rounded value unless it stays within the deadband.
+
+        A value that did not move beyond the deadband is written anyway once
+        the last write is older than the configured max age, so statistics
+        keep advancing. Changes from or to 0 W are always written.
+        """
+        value = round(value, self._precision)
+        last = self._attr_native_value
+        now = time.monotonic()
+
+        available = self.available
+        if last is not None and self._written_at is not None and available == self._written_available:
+            deadband = max(self._deadband_abs, self._deadband_rel * abs(last))
+            within = abs(value - last) <= deadband and not (
+                value != last and (value == 0 or last == 0)
+            )
+            fresh = self._max_age <= 0 or now - self._written_at < self._max_age
+            if within and fresh:
+                if (stats := self._coordinator.stats) is not None:
+                    stats.suppressed += 1
+                return
+
+        self._attr_native_value = value
+        self._written_at = now
+        self._written_available = available
+        self.async_write_ha_state()
+        if (stats := self._coordinator.stats) is not None:
+            stats.writes += 1
+
 
 # =====================================================================
 # PROXY
 # =====================================================================
 
 class ProxyPowerSensor(BasePhSensor):
-    def __init__(self, hass, *, source_entity, entry, key):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
-        self._source = source_entity
+    _input_sensor = True
+
+    def __init__(self, coordinator, *, source, key):
+        super().__init__(coordinator, key=key)
+        self._source = source
         self._attr_entity_registry_enabled_default = False
         self._attr_entity_category = EntityCategory.DIAGNOSTIC
 
     async def async_added_to_hass(self):
-        async_track_state_change_event(self.hass, [self._source], self._changed)
-        self._update()
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self._update, [self._source])
+        )
+        if self._coordinator.ready:
+            self._update()
 
     @callback
-    def _changed(self, event):
-        self._update()
-
     def _update(self):
-        self._attr_native_value = power_in_watt(self.hass, self._entry, self._source)
-        self.async_write_ha_state()
+        self._async_publish(self._coordinator.value(self._source))
 
 class ProxyPvSumPowerSensor(BasePhSensor):
-    def __init__(self, hass, *, entry, key):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
+    _input_sensor = True
+
+    def __init__(self, coordinator, *, key):
+        super().__init__(coordinator, key=key)
         self._attr_entity_registry_enabled_default = False
         self._attr_entity_category = EntityCategory.DIAGNOSTIC
 
     async def async_added_to_hass(self):
-        data = self._entry.options or self._entry.data
-        pv_sensors = data.get("pv_leistung") or []
-        if isinstance(pv_sensors, str):
-            pv_sensors = [pv_sensors]
-
-        async_track_state_change_event(self.hass, pv_sensors, self._update)
-        self._update()
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update, ["pv"]))
+        if self._coordinator.ready:
+            self._update()
 
     @callback
-    def _update(self, event=None):
-        self._attr_native_value = sum_pv_power(self.hass, self._entry)
-        self.async_write_ha_state()
+    def _update(self):
+        self._async_publish(self._coordinator.value("pv"))
 
 class InvertedPowerSensor(BasePhSensor):
-    def __init__(self, hass, *, source_entity, entry, key):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
-        self._source = source_entity
+    _input_sensor = True
+
+    def __init__(self, coordinator, *, source, key):
+        super().__init__(coordinator, key=key)
+        self._source = source
         self._attr_entity_registry_enabled_default = False
 
     async def async_added_to_hass(self):
-        async_track_state_change_event(self.hass, [self._source], self._changed)
-        self._update()
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self._update, [self._source])
+        )
+        if self._coordinator.ready:
+            self._update()
 
     @callback
-    def _changed(self, event):
-        self._update()
-
     def _update(self):
-        value = power_in_watt(self.hass, self._entry, self._source)
-        self._attr_native_value = -value
-        self.async_write_ha_state()
+        value = self._coordinator.value(self._source)
+        self._async_publish(-value)
 
 # =====================================================================
 # SPLIT / COMBINE
 # =====================================================================
 
 class SplitPowerSensor(BasePhSensor):
-    def __init__(self, hass, *, source_entity, entry, key, positive):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
-        self._source = source_entity
+    _input_sensor = True
+
+    def __init__(self, coordinator, *, source, key, positive):
+        super().__init__(coordinator, key=key)
+        self._source = source
         self._positive = positive
 
     async def async_added_to_hass(self):
-        async_track_state_change_event(self.hass, [self._source], self._changed)
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self._update, [self._source])
+        )
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        value = self._coordinator.value(self._source)
+        self._async_publish(max(value, 0) if self._positive else max(-value, 0))
+
+
+class CombinedPowerSensor(BasePhSensor):
+    _input_sensor = True
+
+    def __init__(self, coordinator, *, pos, neg, key, ena_def):
+        super().__init__(coordinator, key=key)
+        self._pos = pos
+        self._neg = neg
+        self._attr_entity_registry_enabled_default = ena_def
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self._update, [self._pos, self._neg])
+        )
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        pos = self._coordinator.value(self._pos)
+        neg = self._coordinator.value(self._neg)
+        self._async_publish(pos - neg)
+
+
+# =====================================================================
+# FLOW SENSORS
+# =====================================================================
+
+class FlowPowerSensor(BasePhSensor, RestoreSensor):
+    _follows_sources = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        # Eine gemeinsame Berechnung pro Eintrag, siehe PowerHelperCoordinator
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+        elif (last := await self.async_get_last_sensor_data()) is not None:
+            # Letzten Wert zeigen, bis die Quellen nach dem Start geliefert haben
+            self._attr_native_value = last.native_value
+
+    @callback
+    def _update(self):
+        self._async_publish(getattr(self._coordinator.flows, self._key))
+
+
+class BatteryFlowPowerSensor(BasePhSensor):
+    """One flow from or to a single battery, e.g. ``akku_2_zu_haus``."""
+
+    _follows_sources = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+        # Übersetzung mit Platzhalter, z. B. "akku_n_zu_haus" -> "Akku 2 zu Haus"
+        n = next(part for part in key.split("_") if part.isdigit())
+        self._attr_translation_key = key.replace(f"_{n}", "_n", 1)
+        self._attr_translation_placeholders = {"n": n}
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        self._async_publish(self._coordinator.battery_flows[self._key])
+
+
+class NodeFlowPowerSensor(BasePhSensor):
+    """One flow from or to an extra producer or consumer, e.g. ``pv_zu_verbraucher_1``."""
+
+    _follows_sources = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+        # Übersetzung mit Platzhaltern, z. B. "erzeuger_n_zu_verbraucher_m" -> "Erzeuger 1 zu Verbraucher 2"
+        parts = key.split("_")
+        names = iter(("n", "m"))
+        placeholders = {}
+        for index, part in enumerate(parts):
+            if part.isdigit():
+                parts[index] = next(names)
+                placeholders[parts[index]] = part
+        self._attr_translation_key = "_".join(parts)
+        self._attr_translation_placeholders = placeholders
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        self._async_publish(self._coordinator.node_flows[self._key])
+
+
+class PhaseFlowPowerSensor(BasePhSensor):
+    """One flow on a single phase, e.g. ``netz_zu_haus_l2``."""
+
+    _follows_sources = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str, phase: str):
+        super().__init__(coordinator, key=f"{key}_{phase}")
+        self._key = key
+        self._phase = phase
+        self._attr_translation_key = f"{key}_phase"
+        self._attr_translation_placeholders = {"phase": phase.upper()}
+        self._attr_entity_registry_enabled_default = False
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        self._async_publish(getattr(self._coordinator.phase_flows[self._phase], self._key))
+
+
+class PhaseGridSensor(BasePhSensor):
+    """Grid consumption or feed-in summed per phase, without balancing."""
+
+    _follows_sources = True
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        self._async_publish(self._coordinator.phase_grid[self._key])
+
+
+# =====================================================================
+# ENERGY SENSORS
+# =====================================================================
+
+class FlowEnergySensor(BasePhSensor, RestoreSensor):
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_icon = "mdi:lightning-bolt"
+    _average = False
+
+    def __init__(self, coordinator: PowerHelperCoordinator, key: str):
+        super().__init__(coordinator, key=f"{key}_energie")
+        self._key = key
+
+    @callback
+    def _load_options(self) -> None:
+        super()._load_options()
+        # Wh-Auflösung, jede Änderung wird geschrieben
+        self._precision = 3
+        self._deadband_abs = 0.0
+        self._deadband_rel = 0.0
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        if (last := await self.async_get_last_sensor_data()) is not None:
+            try:
+                self._coordinator.async_restore_energy(self._key, float(last.native_value))
+            except (TypeError, ValueError):
+                pass
+
+        # Integration läuft im Coordinator, im selben Update wie die Flüsse
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
         self._update()
 
     @callback
-    def _changed(self, event):
+    def _update(self):
+        self._async_publish(self._coordinator.energy[self._key])
+
+
+class PeriodEnergySensor(BasePhSensor):
+    """Energy of one flow in the running day, week or month."""
+
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_icon = "mdi:calendar-range"
+    _average = False
+
+    def __init__(self, coordinator: PowerHelperCoordinator, *, flow_key: str, period: str):
+        super().__init__(coordinator, key=f"{flow_key}_energie_{period}")
+        self._counters = coordinator.period_energy[period]
+        self._key = flow_key
+        self._period = period
+
+    @callback
+    def _load_options(self) -> None:
+        super()._load_options()
+        self._precision = 3
+        self._deadband_abs = 0.0
+        self._deadband_rel = 0.0
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        # Zähler, Rücksetzen und Speichern laufen im Coordinator
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
         self._update()
 
+    @callback
     def _update(self):
-        value = power_in_watt(self.hass, self._entry, self._source)
-        self._attr_native_value = max(value, 0) if self._positive else max(-value, 0)
-        self.async_write_ha_state()
+        self._attr_last_reset = self._coordinator.period_starts.get(self._period)
+        self._async_publish(self._counters[self._key])
 
 
-class CombinedPowerSensor(BasePhSensor):
-    def __init__(self, hass, *, pos_entity, neg_entity, entry, key, ena_def):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
-        self._pos = pos_entity
-        self._neg = neg_entity
-        self._attr_entity_registry_enabled_default = ena_def
+# =====================================================================
+# COSTS
+# =====================================================================
+
+class MoneySensor(BasePhSensor):
+    """Accumulated cost or revenue of one flow at the dynamic tariff."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    # Negative Preise können den Zähler auch senken
+    _attr_state_class = SensorStateClass.TOTAL
+    _average = False
+
+    def __init__(self, coordinator: PowerHelperCoordinator, *, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+        self._attr_native_unit_of_measurement = coordinator.hass.config.currency
+        self._attr_icon = "mdi:cash-minus" if key.endswith("_kosten") else "mdi:cash-plus"
+
+    @callback
+    def _load_options(self) -> None:
+        super()._load_options()
+        self._precision = 2
+        self._deadband_abs = 0.0
+        self._deadband_rel = 0.0
 
     async def async_added_to_hass(self):
-        async_track_state_change_event(self.hass, [self._pos, self._neg], self._changed)
+        await super().async_added_to_hass()
+        # Bewertet und gespeichert wird im Coordinator, im selben Update wie die Flüsse
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
         self._update()
 
     @callback
-    def _changed(self, event):
+    def _update(self):
+        self._async_publish(self._coordinator.money[self._key])
+
+
+# =====================================================================
+# RATIOS
+# =====================================================================
+
+class RatioSensor(BasePhSensor):
+    """Autarky or self-consumption in percent, now, today or over 30 days."""
+
+    _attr_device_class = None
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _average = False
+
+    def __init__(self, coordinator: PowerHelperCoordinator, *, key: str):
+        super().__init__(coordinator, key=key)
+        self._key = key
+        self._attr_icon = "mdi:home-lightning-bolt" if key.startswith("autarkie") else "mdi:solar-power"
+
+    @callback
+    def _load_options(self) -> None:
+        super()._load_options()
+        # Prozentwerte: eigene Auflösung, Totband der Leistungssensoren gilt nicht
+        self._precision = 1
+        self._deadband_abs = 0.0
+        self._deadband_rel = 0.0
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        # Quoten werden im Coordinator aus laufenden Energiesummen berechnet
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        if (value := self._coordinator.ratios[self._key]) is not None:
+            self._async_publish(value)
+
+
+# =====================================================================
+# STATISTICS
+# =====================================================================
+
+class DemandSensor(BasePhSensor):
+    """Mean grid import of the running 15-minute demand interval."""
+
+    _attr_icon = "mdi:chart-bell-curve-cumulative"
+    _average = False
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        if (value := self._coordinator.demand.demand) is not None:
+            self._async_publish(value)
+
+
+class DemandPeakSensor(BasePhSensor, RestoreSensor):
+    """Highest completed 15-minute grid import interval of the month."""
+
+    _attr_icon = "mdi:chart-bell-curve"
+    _average = False
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        demand = self._coordinator.demand
+        if demand.peak is None and (last := await self.async_get_last_state()) is not None:
+            try:
+                at = last.attributes.get("zeitpunkt")
+                demand.restore_peak(
+                    float(last.state),
+                    dt_util.as_timestamp(at) if at else None,
+                    last.attributes.get("periode"),
+                )
+            except (TypeError, ValueError):
+                pass
+
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
         self._update()
 
+    @callback
     def _update(self):
-        pos = power_in_watt(self.hass, self._entry, self._pos)
-        neg = power_in_watt(self.hass, self._entry, self._neg)
-        self._attr_native_value = pos - neg
+        demand = self._coordinator.demand
+        if demand.peak is None:
+            return
+        self._attr_extra_state_attributes = {
+            "periode": demand.peak_period,
+            "zeitpunkt": (
+                dt_util.utc_from_timestamp(demand.peak_at).isoformat()
+                if demand.peak_at is not None
+                else None
+            ),
+        }
+        self._async_publish(demand.peak)
+
+
+class WindowSensor(BasePhSensor):
+    """Time-weighted min, max or mean of one flow over a rolling window."""
+
+    _attr_icon = "mdi:chart-line"
+    _average = False
+
+    def __init__(self, coordinator: PowerHelperCoordinator, *, flow_key: str, stat: str, span: str):
+        super().__init__(coordinator, key=f"{flow_key}_{stat}_{span}")
+        self._window = coordinator.windows[flow_key][span]
+        self._stat = {"min": "min", "max": "max", "mittel": "mean"}[stat]
+        self._attr_entity_registry_enabled_default = False
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        if (value := getattr(self._window, self._stat)) is not None:
+            self._async_publish(value)
+
+
+# =====================================================================
+# SNAPSHOT
+# =====================================================================
+
+class SnapshotSensor(BasePhSensor):
+    """Home power with the complete flow snapshot as attributes.
+
+    Dashboards subscribe to this one entity instead of every flow sensor and
+    always receive a consistent set of values with each state change.
+    """
+
+    _attr_icon = "mdi:transit-connection-variant"
+    # Der Snapshot gehört nicht in die Datenbank, die Einzelsensoren werden aufgezeichnet
+    _unrecorded_attributes = frozenset(
+        {"zeitpunkt", "eingaenge", "fluesse", "matrix", "residuum", "akku_fluesse", "phasen", "veraltet"}
+    )
+    _average = False
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(self._coordinator.async_add_listener(self._update))
+        if self._coordinator.ready:
+            self._update()
+
+    @callback
+    def _update(self):
+        self._async_publish(self._coordinator.flows.haus)
+
+    @callback
+    def _async_write(self, value: float) -> None:
+        # Kein Totband: die Attribute müssen bei jedem Schreiben stimmen
+        self._attr_native_value = round(value, self._precision)
+        self._attr_extra_state_attributes = self._coordinator.snapshot()
+        self._written_at = time.monotonic()
         self.async_write_ha_state()
+        if (stats := self._coordinator.stats) is not None:
+            stats.writes += 1
 
 
 # =====================================================================
-# FLOW SENSORS
+# DIAGNOSTICS
 # =====================================================================
 
-class FlowPowerSensor(BasePhSensor):
-    def __init__(self, hass, entry, key, sources):
-        super().__init__(entry=entry, key=key)
-        self.hass = hass
-        self._key = key
-        self._sources = sources
+class DiagnosticsSensor(BasePhSensor):
+    """Source events handled by the entry, with hot-path counters and timings."""
+
+    _attr_device_class = None
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = None
+    _attr_icon = "mdi:speedometer"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
     async def async_added_to_hass(self):
-        async_track_state_change_event(
-            self.hass,
-            [e for e in self._sources.values() if e],
-            self._update,
+        await super().async_added_to_hass()
+        # Festes Intervall, damit die Messung selbst keine Schreiblast erzeugt
+        self.async_on_remove(
+            async_track_time_interval(self.hass, self._update, timedelta(seconds=60))
         )
         self._update()
 
     @callback
-    def _update(self, event=None):
-        def val(e):
-            return power_in_watt(self.hass, self._entry, e) if e else 0.0
-        cfg = self._entry.options or self._entry.data
-        akku_prio = cfg.get("akku_prio", False)
-        netz = val(self._sources["netz"])
-        pv = sum_pv_power(self.hass, self._entry)
-        akku = val(self._sources["akku"])
-        nb = val(self._sources["netz_bezug"])
-        ne = val(self._sources["netz_einspeisung"])
-        al = val(self._sources["akku_laden"])
-        ae = val(self._sources["akku_entladen"])
-
-        if netz != 0 and nb == 0 and ne == 0:
-            nb = max(netz, 0)
-            ne = max(-netz, 0)
-
-        if netz == 0 and (nb != 0 or ne != 0):
-            netz = nb - ne
-
-        if akku != 0 and al == 0 and ae == 0:
-            ae = max(akku, 0)
-            al = max(-akku, 0)
-
-        if akku == 0 and (al != 0 or ae != 0):
-            akku = ae - al
-
-        haus = netz + pv + akku
-
-        if akku_prio:
-            pv_zu_akku = max(min(pv, al),0)
-            pv_zu_haus = max(min(max(pv - pv_zu_akku, 0), haus),0)
-        else:
-            pv_zu_haus = max(min(pv, haus),0)
-            pv_zu_akku = max(min(max(pv - pv_zu_haus, 0), al),0)
-
-        pv_zu_netz = max(pv - pv_zu_haus - pv_zu_akku, 0)
-
-        akku_zu_haus = max(min(ae, haus - pv_zu_haus),0)
-        akku_zu_netz = max(ae - akku_zu_haus, 0)
-
-        netz_zu_haus = max(haus - pv_zu_haus - akku_zu_haus, 0)
-        netz_zu_akku = max(al - pv_zu_akku, 0)
-
-        mapping = {
-            "haus": haus,
-            "pv_zu_haus": pv_zu_haus,
-            "pv_zu_akku": pv_zu_akku,
-            "pv_zu_netz": pv_zu_netz,
-            "netz_zu_haus": netz_zu_haus,
-            "netz_zu_akku": netz_zu_akku,
-            "akku_zu_haus": akku_zu_haus,
-            "akku_zu_netz": akku_zu_netz,
+    def _update(self, now=None):
+        stats = self._coordinator.stats
+        self._attr_native_value = stats.events
+        self._attr_extra_state_attributes = {
+            **stats.as_dict(),
+            "parse_failures": self._coordinator.parse_failures,
         }
-
-        self._attr_native_value = mapping.get(self._key, 0)
         self.async_write_ha_state()
@@ -0,0 +1,138 @@
+"""Services of the powerHELPER integration."""
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+SERVICE_BACKFILL = "backfill"
+SERVICE_GET_SNAPSHOT = "get_snapshot"
+SERVICE_PROFILE = "profile"
+
+ATTR_ENTRY_ID = "entry_id"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_PERIOD = "periode"
+ATTR_SECONDS = "sekunden"
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_PERIOD, default="hour"): vol.In(["5minute", "hour"]),
+    }
+)
+
+SNAPSHOT_SCHEMA = vol.Schema({vol.Required(ATTR_ENTRY_ID): cv.string})
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_SECONDS, default=30): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=600)
+        ),
+    }
+)
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_util.get_default_time_zone())
+    return dt_util.as_utc(value)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the powerHELPER services."""
+
+    async def _async_backfill(call: ServiceCall) -> None:
+        entry = hass.config_entries.async_get_entry(call.data[ATTR_ENTRY_ID])
+        if entry is None or entry.domain != DOMAIN:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="entry_not_found",
+            )
+
+        # NumPy erst bei Bedarf laden, nicht beim Start
+        from .backfill import async_backfill
+
+        start = _as_utc(call.data[ATTR_START])
+        end = _as_utc(call.data[ATTR_END]) if ATTR_END in call.data else dt_util.utcnow()
+        await async_backfill(hass, entry, start, end, call.data[ATTR_PERIOD])
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BACKFILL, _async_backfill, schema=BACKFILL_SCHEMA
+    )
+
+    @callback
+    def _async_get_snapshot(call: ServiceCall) -> ServiceResponse:
+        entry = hass.config_entries.async_get_entry(call.data[ATTR_ENTRY_ID])
+        # Nur geladene Einträge haben einen Coordinator
+        if entry is None or entry.domain != DOMAIN or entry.entry_id not in hass.data.get(DOMAIN, {}):
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="entry_not_found",
+            )
+        return hass.data[DOMAIN][entry.entry_id]["coordinator"].snapshot()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SNAPSHOT,
+        _async_get_snapshot,
+        schema=SNAPSHOT_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        domain_data = hass.data.get(DOMAIN, {})
+        if domain_data.get("profile"):
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="profile_running",
+            )
+        # Ohne entry_id werden alle geladenen Einträge gemessen
+        entry_ids = (
+            [call.data[ATTR_ENTRY_ID]]
+            if ATTR_ENTRY_ID in call.data
+            else [key for key, data in domain_data.items() if isinstance(data, dict)]
+        )
+        if not entry_ids or any(
+            not isinstance(domain_data.get(entry_id), dict) for entry_id in entry_ids
+        ):
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="entry_not_found",
+            )
+
+        # Erst bei Bedarf laden, inaktiv kostet der Profiler nichts
+        from .profiler import async_profile
+
+        domain_data["profile"] = True
+        try:
+            return await async_profile(
+                hass,
+                [domain_data[entry_id]["coordinator"] for entry_id in entry_ids],
+                call.data[ATTR_SECONDS],
+            )
+        finally:
+            domain_data.pop("profile", None)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,298 @@
+"""Time-weighted rolling statistics of powerHELPER, independent of Home Assistant.
+
+All signals are treated as piecewise constant: a value holds until the next
+update, the same way the flow sensors report it. Every structure here keeps
+a fixed amount of state, no matter how often the sources update.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+import math
+
+
+# =====================================================================
+# ROLLING WINDOW
+# =====================================================================
+
+class RollingWindow:
+    """Time-weighted min, max and mean over the last ``span`` seconds.
+
+    Updates are folded into ``buckets`` fixed-width buckets. Min and max come
+    from monotonic deques over the closed buckets, the mean from running
+    sums, so an update costs O(1) amortized and memory is bounded by the
+    bucket count. The window moves in steps of one bucket width.
+    """
+
+    __slots__ = (
+        "width",
+        "_buckets",
+        "_closed",
+        "_min",
+        "_max",
+        "_integral",
+        "_duration",
+        "_index",
+        "_open_integral",
+        "_open_duration",
+        "_open_min",
+        "_open_max",
+        "_t",
+        "_value",
+    )
+
+    def __init__(self, span: float, buckets: int = 60) -> None:
+        self.width = span / buckets
+        self._buckets = buckets
+        # (Bucket-Index, Integral, Dauer) der abgeschlossenen Buckets im Fenster
+        self._closed: deque[tuple[int, float, float]] = deque()
+        self._min: deque[tuple[int, float]] = deque()
+        self._max: deque[tuple[int, float]] = deque()
+        self._integral = 0.0
+        self._duration = 0.0
+        self._index = 0
+        self._open_integral = 0.0
+        self._open_duration = 0.0
+        self._open_min = math.inf
+        self._open_max = -math.inf
+        self._t: float | None = None
+        self._value = 0.0
+
+    def update(self, t: float, value: float) -> None:
+        """Hold ``value`` from ``t`` on."""
+        if self._t is None:
+            self._index = int(t // self.width)
+            self._t = t
+        elif t > self._t:
+            self._advance(t)
+
+        self._value = value
+        self._open_min = min(self._open_min, value)
+        self._open_max = max(self._open_max, value)
+
+    @property
+    def mean(self) -> float | None:
+        duration = self._duration + self._open_duration
+        if duration <= 0:
+            return self._value if self._t is not None else None
+        return (self._integral + self._open_integral) / duration
+
+    @property
+    def min(self) -> float | None:
+        if self._t is None:
+            return None
+        return min(self._min[0][1], self._open_min) if self._min else self._open_min
+
+    @property
+    def max(self) -> float | None:
+        if self._t is None:
+            return None
+        return max(self._max[0][1], self._open_max) if self._max else self._open_max
+
+    def _advance(self, t: float) -> None:
+        width = self.width
+        value = self._value
+        pos = self._t
+        self._t = t
+
+        if t - pos > (self._buckets + 1) * width:
+            # Lange Lücke: das Fenster besteht nur noch aus dem gehaltenen Wert
+            self._clear()
+            self._index = int(t // width) - self._buckets - 1
+            pos = self._index * width
+            self._open_min = self._open_max = value
+
+        while True:
+            end = (self._index + 1) * width
+            if t < end:
+                self._open_integral += value * (t - pos)
+                self._open_duration += t - pos
+                return
+            self._open_integral += value * (end - pos)
+            self._open_duration += end - pos
+            self._close()
+            pos = end
+
+    def _close(self) -> None:
+        index = self._index
+        if self._open_duration > 0:
+            self._closed.append((index, self._open_integral, self._open_duration))
+            self._integral += self._open_integral
+            self._duration += self._open_duration
+
+            low = self._open_min
+            while self._min and self._min[-1][1] >= low:
+                self._min.pop()
+            self._min.append((index, low))
+
+            high = self._open_max
+            while self._max and self._max[-1][1] <= high:
+                self._max.pop()
+            self._max.append((index, high))
+
+        index += 1
+        self._index = index
+        oldest = index - self._buckets
+        while self._closed and self._closed[0][0] < oldest:
+            _, integral, duration = self._closed.popleft()
+            self._integral -= integral
+            self._duration -= duration
+        if not self._closed:
+            # Rundungsfehler der laufenden Summen nicht mitschleppen
+            self._integral = self._duration = 0.0
+        while self._min and self._min[0][0] < oldest:
+            self._min.popleft()
+        while self._max and self._max[0][0] < oldest:
+            self._max.popleft()
+
+        # Der gehaltene Wert reicht in den neuen Bucket hinein
+        self._open_integral = self._open_duration = 0.0
+        self._open_min = self._open_max = self._value
+
+    def _clear(self) -> None:
+        self._closed.clear()
+        self._min.clear()
+        self._max.clear()
+        self._integral = self._duration = 0.0
+        self._open_integral = self._open_duration = 0.0
+
+
+# =====================================================================
+# DEMAND
+# =====================================================================
+
+class DemandMeter:
+    """Mean power over fixed, aligned demand intervals and their peak.
+
+    Intervals are aligned to multiples of ``interval`` seconds since the
+    epoch, which matches local quarter hours in every time zone. The peak
+    is the highest completed interval of the current billing period;
+    ``period`` maps an interval start to its period (e.g. the month).
+    """
+
+    __slots__ = (
+        "interval",
+        "_period",
+        "_start",
+        "_integral",
+        "_t",
+        "_value",
+        "last",
+        "peak",
+        "peak_at",
+        "peak_period",
+    )
+
+    def __init__(
+        self,
+        interval: float = 900.0,
+        period: Callable[[float], str] | None = None,
+    ) -> None:
+        self.interval = interval
+        self._period = period
+        self._start: float | None = None
+        self._integral = 0.0
+        self._t = 0.0
+        self._value = 0.0
+        self.last: float | None = None
+        self.peak: float | None = None
+        self.peak_at: float | None = None
+        self.peak_period: str | None = None
+
+    def update(self, t: float, value: float) -> None:
+        """Hold ``value`` from ``t`` on."""
+        if self._start is None:
+            self._start = t - t % self.interval
+            self._t = t
+        elif t > self._t:
+            pos = self._t
+            while t >= (end := self._start + self.interval):
+                self._integral += self._value * (end - pos)
+                self._finish(self._start, self._integral / self.interval)
+                self._start = end
+                self._integral = 0.0
+                pos = end
+            self._integral += self._value * (t - pos)
+            self._t = t
+        self._value = value
+
+    @property
+    def demand(self) -> float | None:
+        """Return the mean power of the running interval so far."""
+        if self._start is None:
+            return None
+        elapsed = self._t - self._start
+        return self._integral / elapsed if elapsed > 0 else self._value
+
+    def restore_peak(self, value: float, at: float | None, period: str | None) -> None:
+        """Continue the peak of a billing period from a restored state."""
+        self.peak = value
+        self.peak_at = at
+        self.peak_period = period
+
+    def _finish(self, start: float, demand: float) -> None:
+        self.last = demand
+        period = self._period(start) if self._period is not None else None
+        if period != self.peak_period:
+            # Neuer Abrechnungszeitraum: Spitze beginnt von vorn
+            self.peak = None
+            self.peak_period = period
+        if self.peak is None or demand > self.peak:
+            self.peak = demand
+            self.peak_at = start
+
+
+# =====================================================================
+# ROLLING SUM
+# =====================================================================
+
+class RollingSum:
+    """Sum of the amounts added during the last ``span`` seconds.
+
+    Amounts are collected in ``buckets`` fixed-width buckets of a ring, so
+    the window moves in steps of one bucket width, an update costs O(1)
+    amortized and memory is bounded by the bucket count.
+    """
+
+    __slots__ = ("width", "_ring", "_index", "total")
+
+    def __init__(self, span: float, buckets: int = 30) -> None:
+        self.width = span / buckets
+        self._ring = [0.0] * buckets
+        self._index: int | None = None
+        self.total = 0.0
+
+    def add(self, t: float, amount: float) -> None:
+        """Add ``amount`` at time ``t``."""
+        index = int(t // self.width)
+        ring = self._ring
+        size = len(ring)
+        if self._index is None:
+            self._index = index
+        elif index < self._index:
+            # Verspätete Beträge zählen zum laufenden Bucket
+            index = self._index
+        elif index > self._index:
+            if index - self._index >= size:
+                # Lange Lücke: nichts mehr im Fenster
+                ring[:] = [0.0] * size
+                self.total = 0.0
+            else:
+                for i in range(self._index + 1, index + 1):
+                    self.total -= ring[i % size]
+                    ring[i % size] = 0.0
+            self._index = index
+        ring[index % size] += amount
+        self.total += amount
+
+    def as_dict(self) -> dict:
+        """Return the state for persistence."""
+        return {"index": self._index, "ring": list(self._ring)}
+
+    def restore(self, data: dict) -> None:
+        """Continue from a state returned by ``as_dict``."""
+        if len(data.get("ring", ())) != len(self._ring):
+            return
+        self._ring = [float(v) for v in data["ring"]]
+        self._index = data["index"]
+        self.total = sum(self._ring)
@@ -0,0 +1,19 @@
+"""Shared pytest setup for the powerHELPER tests.
+
+The Home Assistant independent modules (engine, filters, windows) are
+imported directly from the integration directory, so their tests run
+without Home Assistant. Tests that need it (or NumPy) skip themselves
+with ``pytest.importorskip``.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+INTEGRATION = ROOT / "custom_components" / "power_helper"
+
+# Paket für HA-Tests, Integrationsverzeichnis für die HA-freien Module
+for path in (ROOT, INTEGRATION):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,137 @@
+"""Tests of the statistics alignment and import of the backfill service."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("homeassistant")
+
+from custom_components.power_helper import backfill  # noqa: E402
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+T0 = START.timestamp()
+
+
+# =====================================================================
+# ALIGN
+# =====================================================================
+
+def _rows(*pairs):
+    return [{"start": T0 + step * 3600, "mean": mean} for step, mean in pairs]
+
+
+def test_align_places_means_on_the_grid():
+    values = backfill.align(_rows((0, 100.0), (1, 200.0), (2, 300.0)), T0, 3600, 3)
+    assert values.tolist() == [100.0, 200.0, 300.0]
+
+
+def test_align_is_zero_before_the_first_value():
+    values = backfill.align(_rows((2, 500.0)), T0, 3600, 4)
+    assert values.tolist() == [0.0, 0.0, 500.0, 500.0]
+
+
+def test_align_holds_short_gaps():
+    values = backfill.align(_rows((0, 100.0), (3, 400.0)), T0, 3600, 4)
+    assert values.tolist() == [100.0, 100.0, 100.0, 400.0]
+
+
+def test_align_does_not_fill_long_gaps():
+    # Mehrtägiger Recorder-Ausfall: nur MAX_HOLD_STEPS Schritte halten
+    size = 72
+    values = backfill.align(_rows((0, 2000.0), (size - 1, 50.0)), T0, 3600, size)
+    held = backfill.MAX_HOLD_STEPS
+    assert values[: held + 1].tolist() == [2000.0] * (held + 1)
+    assert not values[held + 1 : size - 1].any()
+    assert values[size - 1] == 50.0
+
+
+def test_align_ignores_missing_means_and_rows_outside():
+    rows = _rows((-1, 999.0), (0, None), (1, 10.0), (5, 999.0))
+    values = backfill.align(rows, T0, 3600, 3)
+    assert values.tolist() == [0.0, 10.0, 10.0]
+
+
+# =====================================================================
+# IMPORT
+# =====================================================================
+
+class _Recorder:
+    """Records the statistics calls of _async_import."""
+
+    def __init__(self, existing: list[dict]) -> None:
+        self.existing = existing
+        self.imported: list[dict] | None = None
+        self.adjusted: tuple | None = None
+
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+    def statistics_during_period(self, hass, start, end, ids, *args):
+        (statistic_id,) = ids
+        return {statistic_id: self.existing}
+
+    def async_import_statistics(self, hass, metadata, rows):
+        self.imported = rows
+
+    def async_adjust_statistics(self, hass, statistic_id, start, adjustment, unit):
+        self.adjusted = (start, adjustment)
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    def install(existing: list[dict]) -> _Recorder:
+        rec = _Recorder(existing)
+        monkeypatch.setattr(backfill, "get_instance", lambda hass: rec)
+        for name in ("statistics_during_period", "async_import_statistics", "async_adjust_statistics"):
+            monkeypatch.setattr(backfill, name, getattr(rec, name))
+        return rec
+
+    return install
+
+
+def _import(hours: list[datetime], hourly: list[float]) -> None:
+    asyncio.run(backfill._async_import(SimpleNamespace(), "sensor.x", hours, np.array(hourly)))
+
+
+def test_import_joins_the_sum_before_the_range(recorder):
+    rec = recorder([{"start": T0 - 3600, "sum": 10.0}])
+    hours = [START + timedelta(hours=h) for h in range(3)]
+    _import(hours, [1.0, 2.0, 3.0])
+
+    assert [row["sum"] for row in rec.imported] == [11.0, 13.0, 16.0]
+    assert all("state" not in row for row in rec.imported)
+    assert rec.adjusted is None
+
+
+def test_import_shifts_later_sums_by_the_difference(recorder):
+    # Bisher 5 kWh im Zeitraum (Summe 15 am Ende), neu 6 kWh
+    rec = recorder(
+        [
+            {"start": T0 - 3600, "sum": 10.0},
+            {"start": T0, "sum": 12.0},
+            {"start": T0 + 3600, "sum": 15.0},
+        ]
+    )
+    hours = [START + timedelta(hours=h) for h in range(2)]
+    _import(hours, [2.0, 4.0])
+
+    assert [row["sum"] for row in rec.imported] == [12.0, 16.0]
+    assert rec.adjusted == (START + timedelta(hours=2), 1.0)
+
+
+def test_import_without_existing_statistics_starts_at_zero(recorder):
+    rec = recorder([])
+    _import([START], [1.5])
+    assert rec.imported == [{"start": START, "sum": 1.5}]
+    assert rec.adjusted is None
+
+
+def test_import_of_an_empty_range_does_nothing(recorder):
+    rec = recorder([{"start": T0, "sum": 1.0}])
+    _import([], [])
+    assert rec.imported is None
+    assert rec.adjusted is None
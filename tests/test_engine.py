@@ -0,0 +1,169 @@
+"""Tests of the flow graph and its standard topologies."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from engine import (
+    FlowGraph,
+    FlowInput,
+    FlowResult,
+    balance,
+    compute_flows,
+    node_flows,
+    standard_flows,
+    standard_graph,
+)
+
+
+def _flows(graph, pairs_by_key, supply, demand):
+    matrix = graph.solve(supply, demand)
+    return {
+        key: sum(matrix[graph.sources.index(a)][graph.sinks.index(b)] for a, b in pairs)
+        for key, pairs in pairs_by_key.items()
+    }
+
+
+def _inputs(count: int) -> list[FlowInput]:
+    rng = random.Random(42)
+    inputs = [
+        FlowInput(
+            netz=rng.uniform(-5000, 5000),
+            pv=rng.uniform(0, 8000),
+            akku=rng.uniform(-3000, 3000),
+        )
+        for _ in range(count)
+    ]
+    # Getrennte Sensoren, Nullwerte und genau ausgeglichene Bilanzen
+    inputs += [
+        FlowInput(pv=rng.uniform(0, 8000), netz_bezug=rng.uniform(0, 3000), akku_laden=rng.uniform(0, 2000))
+        for _ in range(count // 10)
+    ]
+    inputs += [
+        FlowInput(),
+        FlowInput(pv=1000.0, netz=-1000.0),
+        FlowInput(pv=1000.0, akku=-1000.0),
+        FlowInput(netz=500.0, akku=-500.0),
+    ]
+    return inputs
+
+
+# =====================================================================
+# STANDARD TOPOLOGY
+# =====================================================================
+
+
+@pytest.mark.parametrize("akku_prio", [False, True])
+def test_graph_matches_compute_flows(akku_prio):
+    graph = standard_graph(akku_prio)
+    matrix = graph.new_matrix()
+    cells = {key: [graph.cell(*pair) for pair in pairs] for key, pairs in standard_flows().items()}
+    out = FlowResult()
+
+    for inp in _inputs(2000):
+        compute_flows(inp, akku_prio, out)
+        haus, pv, al, ae = balance(inp)
+        graph.solve((pv, ae, 0.0), (haus, al, 0.0), matrix)
+        # Bitgenau gleich, nicht nur näherungsweise
+        for key, key_cells in cells.items():
+            assert sum(matrix[i][j] for i, j in key_cells) == getattr(out, key), (inp, key)
+
+
+def test_grid_takes_any_surplus():
+    graph = standard_graph()
+    flows = _flows(graph, standard_flows(), [5000.0, 0.0, 0.0], [1000.0, 0.0, 0.0])
+    assert flows["pv_zu_haus"] == 1000.0
+    assert flows["pv_zu_netz"] == 4000.0
+    assert flows["netz_zu_haus"] == 0.0
+
+
+def test_grid_covers_any_deficit():
+    graph = standard_graph()
+    # Angebot und Nachfrage am Netzknoten werden ignoriert
+    flows = _flows(graph, standard_flows(), [200.0, 0.0, 123.0], [1000.0, 300.0, 456.0])
+    assert flows["pv_zu_haus"] == 200.0
+    assert flows["netz_zu_haus"] == 800.0
+    assert flows["netz_zu_akku"] == 300.0
+    assert flows["pv_zu_netz"] == 0.0
+
+
+def test_storage_node_never_supplies_itself():
+    graph = FlowGraph(("akku", "netz"), ("akku", "netz"))
+    matrix = graph.solve([500.0, 0.0], [500.0, 0.0])
+    assert matrix[0] == [0.0, 500.0]
+    assert matrix[1] == [500.0, 0.0]
+
+
+def test_batteries_are_nodes_of_their_own():
+    batteries = ["akku_1", "akku_2"]
+    graph = standard_graph(batteries=batteries)
+    assert graph.sources == ("pv", "akku_1", "akku_2", "netz")
+    assert graph.sinks == ("haus", "akku_1", "akku_2", "netz")
+
+    # Akku 1 entlädt 1000 W, Akku 2 lädt 400 W, Haus braucht 300 W
+    matrix = graph.solve([0.0, 1000.0, 0.0, 0.0], [300.0, 0.0, 400.0, 0.0])
+    assert matrix[graph.sources.index("akku_1")] == [300.0, 0.0, 400.0, 300.0]
+    assert matrix[graph.sources.index("akku_2")] == [0.0, 0.0, 0.0, 0.0]
+    assert matrix[graph.sources.index("netz")] == [0.0, 0.0, 0.0, 0.0]
+
+    flows = _flows(graph, standard_flows(batteries), [0.0, 1000.0, 0.0, 0.0], [300.0, 0.0, 400.0, 0.0])
+    assert flows["akku_zu_haus"] == 300.0
+    assert flows["akku_zu_netz"] == 300.0
+    assert flows["netz_zu_akku"] == 0.0
+
+
+def test_battery_priority_orders_pv_across_batteries():
+    graph = standard_graph(True, ["akku_1", "akku_2"])
+    flows = _flows(graph, standard_flows(["akku_1", "akku_2"]), [1000.0, 0.0, 0.0, 0.0], [800.0, 300.0, 500.0, 0.0])
+    assert flows["pv_zu_akku"] == 800.0
+    assert flows["pv_zu_haus"] == 200.0
+    assert flows["netz_zu_haus"] == 600.0
+
+
+# =====================================================================
+# PRODUCERS AND CONSUMERS
+# =====================================================================
+
+
+def test_producers_supply_after_pv_in_their_order():
+    producers = ["erzeuger_1", "erzeuger_2"]
+    graph = standard_graph(producers=producers)
+    assert graph.sources == ("pv", "erzeuger_1", "erzeuger_2", "akku", "netz")
+
+    # Quellen pv, erzeuger_1, erzeuger_2, akku, netz / Senken haus, akku, netz
+    flows = _flows(graph, node_flows(producers, []), [1000.0, 800.0, 500.0, 0.0, 0.0], [1500.0, 0.0, 0.0])
+    assert flows["erzeuger_1_zu_haus"] == 500.0
+    assert flows["erzeuger_1_zu_netz"] == 300.0
+    assert flows["erzeuger_2_zu_haus"] == 0.0
+    assert flows["erzeuger_2_zu_netz"] == 500.0
+
+
+@pytest.mark.parametrize(
+    ("consumer_prio", "expected"),
+    [
+        (False, {"pv_zu_verbraucher_1": 200.0, "netz_zu_verbraucher_1": 400.0}),
+        (True, {"pv_zu_verbraucher_1": 600.0, "netz_zu_verbraucher_1": 0.0}),
+    ],
+)
+def test_consumers_are_served_by_priority(consumer_prio, expected):
+    consumers = ["verbraucher_1"]
+    graph = standard_graph(consumers=consumers, consumer_prio=consumer_prio)
+    demand = dict.fromkeys(graph.sinks, 0.0)
+    demand.update(haus=800.0, verbraucher_1=600.0)
+
+    supply = [1000.0, 0.0, 0.0]
+    flows = _flows(graph, node_flows([], consumers), supply, [demand[sink] for sink in graph.sinks])
+    assert {key: flows[key] for key in expected} == expected
+
+    # Die Haus-Flüsse umfassen das ganze Haus, Verbraucher eingeschlossen
+    totals = _flows(graph, standard_flows(consumers=consumers), supply, [demand[sink] for sink in graph.sinks])
+    assert totals["pv_zu_haus"] == 1000.0
+    assert totals["netz_zu_haus"] == 400.0
+
+
+def test_node_flows_cover_every_producer_consumer_pair():
+    flows = node_flows(["erzeuger_1"], ["verbraucher_1", "verbraucher_2"], ["akku_1", "akku_2"])
+    assert flows["erzeuger_1_zu_verbraucher_2"] == [("erzeuger_1", "verbraucher_2")]
+    assert flows["akku_zu_verbraucher_1"] == [("akku_1", "verbraucher_1"), ("akku_2", "verbraucher_1")]
+    assert ("erzeuger_1", "verbraucher_1") in flows["erzeuger_1_zu_haus"]
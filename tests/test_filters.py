@@ -0,0 +1,156 @@
+"""Tests of the input filter stage."""
+from __future__ import annotations
+
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from filters import SourceFilter, make_filters
+
+# =====================================================================
+# LIMIT
+# =====================================================================
+
+
+def test_limit_rejects_implausible_values():
+    source_filter = SourceFilter(limit=10000)
+    assert source_filter.update(65535.0, 0) is None
+    assert source_filter.value is None
+
+    assert source_filter.update(500.0, 1) == 500.0
+    assert source_filter.update(-20000.0, 2) is None
+    assert source_filter.update(65535.0, 3) is None
+    assert source_filter.value == 500.0
+    assert source_filter.rejected == 3
+
+    # Verworfene Werte werden auch nicht wiederholt
+    assert source_filter.advance(4) == 500.0
+
+
+def test_limit_keeps_values_at_the_limit():
+    source_filter = SourceFilter(limit=10000)
+    assert source_filter.update(-10000.0, 0) == -10000.0
+    assert source_filter.rejected == 0
+
+
+# =====================================================================
+# MEDIAN
+# =====================================================================
+
+
+def test_median_uses_the_lower_middle_while_filling():
+    source_filter = SourceFilter(median=5)
+    # Eine Spitze im zweiten Wert kommt beim Anlaufen nicht durch
+    values = (100.0, 5000.0, 200.0, 300.0, 400.0)
+    results = [source_filter.update(value, t) for t, value in enumerate(values)]
+    assert results == [100.0, 100.0, 200.0, 200.0, 300.0]
+
+
+def test_median_replaces_the_oldest_value_once_full():
+    source_filter = SourceFilter(median=3)
+    for t, value in enumerate((100.0, 200.0, 300.0)):
+        source_filter.update(value, t)
+    assert source_filter.update(-5000.0, 3) == 200.0
+    assert source_filter.update(400.0, 4) == 300.0
+    assert source_filter.update(500.0, 5) == 400.0
+
+
+# =====================================================================
+# MOVING AVERAGE
+# =====================================================================
+
+
+def test_moving_average_is_weighted_by_the_time_between_samples():
+    source_filter = SourceFilter(tau=10)
+    source_filter.update(0.0, 0)
+    assert source_filter.update(1000.0, 10) == pytest.approx(1000 * (1 - math.exp(-1)))
+    assert source_filter.update(1000.0, 11) == pytest.approx(1000 * (1 - math.exp(-1.1)))
+
+
+def test_moving_average_does_not_depend_on_the_sample_rate():
+    sparse = SourceFilter(tau=10)
+    sparse.update(0.0, 0)
+    sparse.update(1000.0, 1)
+    sparse.update(1000.0, 20)
+
+    dense = SourceFilter(tau=10)
+    dense.update(0.0, 0)
+    for t in (1, 2.5, 3, 7, 12.25, 20):
+        dense.update(1000.0, t)
+
+    assert dense.value == pytest.approx(sparse.value)
+    assert sparse.value == pytest.approx(1000 * (1 - math.exp(-2)))
+
+
+def test_moving_average_gives_no_weight_without_elapsed_time():
+    source_filter = SourceFilter(tau=10)
+    source_filter.update(0.0, 5)
+    assert source_filter.update(1000.0, 5) == 0.0
+    assert source_filter.update(1000.0, 4) == 0.0
+    assert source_filter.update(1000.0, 15) == pytest.approx(1000 * (1 - math.exp(-1)))
+
+
+# =====================================================================
+# ADVANCE
+# =====================================================================
+
+
+def test_advance_without_a_sample_does_nothing():
+    assert SourceFilter(tau=10).advance(60) is None
+
+
+def test_advance_lets_the_moving_average_converge():
+    source_filter = SourceFilter(tau=10)
+    source_filter.update(0.0, 0)
+    source_filter.update(1000.0, 0.5)
+    for t in range(60, 601, 60):
+        source_filter.advance(t)
+    assert source_filter.value == pytest.approx(1000.0)
+
+
+def test_advance_fills_the_median_with_the_steady_value():
+    source_filter = SourceFilter(median=3)
+    source_filter.update(0.0, 0)
+    assert source_filter.update(1000.0, 1) == 0.0
+    assert source_filter.advance(60) == 1000.0
+
+
+def test_make_filters_is_none_without_an_active_stage():
+    assert make_filters(["sensor.a"], {"filter_median": 1}) is None
+    filters = make_filters(["sensor.a", "sensor.b"], {"filter_zeitkonstante": 5})
+    assert set(filters) == {"sensor.a", "sensor.b"}
+    assert filters["sensor.a"] is not filters["sensor.b"]
+
+
+# =====================================================================
+# REFILTER
+# =====================================================================
+
+
+def test_refilter_converges_without_state_changes():
+    pytest.importorskip("homeassistant")
+    from custom_components.power_helper.coordinator import PowerHelperCoordinator, SourceCache
+
+    cache = SourceCache({"pv": ["sensor.pv"], "netz": ["sensor.netz"]}, set())
+    filters = {entity_id: SourceFilter(tau=60) for entity_id in cache.roles}
+    for entity_id in filters:
+        cache.update(entity_id, filters[entity_id].update(0.0, 0))
+    # PV springt auf 1000 W und meldet danach keinen neuen Zustand mehr
+    cache.update("sensor.pv", filters["sensor.pv"].update(1000.0, 1))
+    filters["sensor.netz"].update(1000.0, 1)
+
+    coordinator = SimpleNamespace(
+        _hub=SimpleNamespace(unavailable=set()),
+        _filters=filters,
+        stale={"sensor.netz"},
+        cache=cache,
+        _pending=set(),
+    )
+    for minute in range(1, 11):
+        PowerHelperCoordinator._async_refilter(coordinator, 1 + minute * 60)
+
+    assert cache.values["sensor.pv"] == pytest.approx(1000.0, rel=1e-4)
+    assert coordinator._pending == {"sensor.pv"}
+    # Veraltete Quellen laufen nicht weiter
+    assert cache.values["sensor.netz"] == 0.0
@@ -0,0 +1,127 @@
+"""Tests of the calendar reset of the daily, weekly and monthly counters."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.power_helper.coordinator import (  # noqa: E402
+    PERIODS,
+    PowerHelperCoordinator,
+    _calendar_periods,
+)
+from custom_components.power_helper.engine import FLOW_KEYS  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def berlin():
+    zone = dt_util.get_time_zone("Europe/Berlin")
+    dt_util.set_default_time_zone(zone)
+    yield zone
+    dt_util.set_default_time_zone(dt_util.UTC)
+
+
+def _local(zone, *args) -> float:
+    return datetime(*args, tzinfo=zone).timestamp()
+
+
+def _counters(now: float) -> PowerHelperCoordinator:
+    # Nur der Zustand der Periodenzähler, ohne Quellen und Store
+    coordinator = PowerHelperCoordinator.__new__(PowerHelperCoordinator)
+    coordinator.period_energy = {period: dict.fromkeys(FLOW_KEYS, 0.0) for period in PERIODS}
+    coordinator.period_starts = {}
+    coordinator._period_end = 0.0
+    coordinator._deltas = dict.fromkeys(FLOW_KEYS, 0.0)
+    coordinator._async_roll_periods(now)
+    return coordinator
+
+
+def _step(coordinator: PowerHelperCoordinator, last: float, now: float, kwh: float = 1.0) -> None:
+    coordinator._deltas["haus"] = kwh
+    coordinator._async_count_periods(last, now)
+
+
+def _haus(coordinator: PowerHelperCoordinator) -> dict[str, float]:
+    return {period: counters["haus"] for period, counters in coordinator.period_energy.items()}
+
+
+# =====================================================================
+# CALENDAR
+# =====================================================================
+
+
+def test_calendar_periods_start_at_local_midnight(berlin):
+    starts, next_midnight = _calendar_periods(_local(berlin, 2026, 10, 14, 15, 0))
+    assert starts["tag"] == datetime(2026, 10, 14, tzinfo=berlin)
+    assert starts["woche"] == datetime(2026, 10, 12, tzinfo=berlin)
+    assert starts["monat"] == datetime(2026, 10, 1, tzinfo=berlin)
+    assert next_midnight == _local(berlin, 2026, 10, 15, 0, 0)
+
+
+def test_calendar_day_follows_the_clock_change(berlin):
+    # 25. Oktober 2026: Ende der Sommerzeit, der Tag hat 25 Stunden
+    starts, next_midnight = _calendar_periods(_local(berlin, 2026, 10, 25, 12, 0))
+    assert next_midnight - starts["tag"].timestamp() == 25 * 3600
+    assert next_midnight == _local(berlin, 2026, 10, 26, 0, 0)
+
+
+# =====================================================================
+# COUNTERS
+# =====================================================================
+
+
+def test_step_within_a_day_counts_fully(berlin):
+    start = _local(berlin, 2026, 10, 14, 10, 0)
+    coordinator = _counters(start)
+    _step(coordinator, start, start + 3600)
+    _step(coordinator, start + 3600, start + 7200, 2.0)
+    assert _haus(coordinator) == {"tag": 3.0, "woche": 3.0, "monat": 3.0}
+
+
+def test_day_resets_at_local_midnight(berlin):
+    # Dienstag -> Mittwoch
+    start = _local(berlin, 2026, 10, 13, 22, 30)
+    coordinator = _counters(start)
+    _step(coordinator, start, _local(berlin, 2026, 10, 13, 23, 30))
+    _step(coordinator, _local(berlin, 2026, 10, 13, 23, 30), _local(berlin, 2026, 10, 14, 0, 30))
+
+    # Der Schritt über Mitternacht wird anteilig verteilt
+    assert _haus(coordinator) == pytest.approx({"tag": 0.5, "woche": 2.0, "monat": 2.0})
+    assert coordinator.period_starts["tag"] == datetime(2026, 10, 14, tzinfo=berlin)
+
+
+def test_week_resets_on_monday(berlin):
+    start = _local(berlin, 2026, 10, 18, 23, 0)
+    coordinator = _counters(start)
+    _step(coordinator, start, _local(berlin, 2026, 10, 19, 0, 30), 3.0)
+
+    assert _haus(coordinator) == pytest.approx({"tag": 1.0, "woche": 1.0, "monat": 3.0})
+    assert coordinator.period_starts["woche"] == datetime(2026, 10, 19, tzinfo=berlin)
+
+
+def test_month_resets_on_the_first(berlin):
+    # Samstag, 31. Oktober -> Sonntag, 1. November: gleiche Woche
+    start = _local(berlin, 2026, 10, 31, 23, 0)
+    coordinator = _counters(start)
+    _step(coordinator, start, _local(berlin, 2026, 11, 1, 1, 0), 2.0)
+
+    assert _haus(coordinator) == pytest.approx({"tag": 1.0, "woche": 2.0, "monat": 1.0})
+    assert coordinator.period_starts["monat"] == datetime(2026, 11, 1, tzinfo=berlin)
+
+
+def test_step_over_several_days_starts_the_newest_periods(berlin):
+    start = _local(berlin, 2026, 10, 30, 12, 0)
+    coordinator = _counters(start)
+    _step(coordinator, start, _local(berlin, 2026, 11, 3, 12, 0), 8.0)
+
+    # Nur der Anteil nach der letzten Grenze zählt für die neuen Perioden
+    assert coordinator.period_starts["tag"] == datetime(2026, 11, 3, tzinfo=berlin)
+    assert coordinator.period_starts["woche"] == datetime(2026, 11, 2, tzinfo=berlin)
+    assert coordinator.period_starts["monat"] == datetime(2026, 11, 1, tzinfo=berlin)
+    assert _haus(coordinator) == pytest.approx(
+        {"tag": 8.0 * 12 / 96, "woche": 8.0 * 36 / 96, "monat": 8.0 * 60 / 96}
+    )
@@ -0,0 +1,100 @@
+"""Tests of the per-entity write budget with time-weighted averaging."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from benchmarks.fake_hass import FakeLoop  # noqa: E402
+from custom_components.power_helper import sensor  # noqa: E402
+
+
+class _Sensor(sensor.BasePhSensor):
+    """Power sensor that records its writes instead of touching hass."""
+
+    def __init__(self, loop: FakeLoop, options: dict) -> None:
+        entry = SimpleNamespace(entry_id="test", title="Test", options=options, data={})
+        super().__init__(SimpleNamespace(entry=entry, stats=None, available=True), key="haus")
+        self.hass = SimpleNamespace(loop=loop)
+        self.writes: list[tuple[float, float]] = []
+
+    def async_write_ha_state(self) -> None:
+        self.writes.append((self.hass.loop.time(), self._attr_native_value))
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = FakeLoop(start=1000.0)
+    # Schreibbudget und Timer laufen auf derselben virtuellen Uhr
+    monkeypatch.setattr(sensor, "time", SimpleNamespace(monotonic=loop.time))
+    return loop
+
+
+def _publish(loop: FakeLoop, entity: _Sensor, at: float, value: float) -> None:
+    loop.advance_to(at)
+    entity._async_publish(value)
+
+
+def test_values_within_the_budget_are_averaged(loop):
+    entity = _Sensor(loop, {"min_schreibabstand": 10})
+    _publish(loop, entity, 1000, 0.0)
+    _publish(loop, entity, 1001, 3000.0)
+    assert entity.writes == [(1000, 0.0)]
+
+    # Mittel über das Intervall, danach der gehaltene Wert
+    loop.advance_to(1100)
+    assert entity.writes == [(1000, 0.0), (1010, 2700.0), (1020, 3000.0)]
+    assert entity._budget_handle is None
+
+
+def test_step_after_an_idle_gap_is_written_at_once(loop):
+    entity = _Sensor(loop, {"min_schreibabstand": 10})
+    _publish(loop, entity, 1000, 0.0)
+    loop.advance_to(1100)
+
+    # Kein Mittel über die Pause: der neue Wert gilt erst ab jetzt
+    _publish(loop, entity, 1100, 3000.0)
+    assert entity.writes == [(1000, 0.0), (1100, 3000.0)]
+    loop.advance_to(1200)
+    assert entity.writes == [(1000, 0.0), (1100, 3000.0)]
+    assert entity._budget_handle is None
+
+
+def test_step_after_an_idle_gap_starts_a_new_window(loop):
+    entity = _Sensor(loop, {"min_schreibabstand": 10})
+    _publish(loop, entity, 1000, 0.0)
+    _publish(loop, entity, 1100, 3000.0)
+    _publish(loop, entity, 1105, 1000.0)
+
+    # Das Fenster beginnt mit dem Sprung, nicht mit dem letzten Schreiben vor der Pause
+    loop.advance_to(1200)
+    assert entity.writes == [(1000, 0.0), (1100, 3000.0), (1110, 2000.0), (1120, 1000.0)]
+
+
+def test_removing_the_budget_flushes_the_held_value(loop):
+    options = {"min_schreibabstand": 10}
+    entity = _Sensor(loop, options)
+    _publish(loop, entity, 1000, 0.0)
+    _publish(loop, entity, 1001, 5.0)
+    assert entity._budget_handle is not None
+
+    options["min_schreibabstand"] = 0
+    entity._async_options_changed()
+    assert entity.writes == [(1000, 0.0), (1001, 5.0)]
+    assert entity._budget_handle is None
+    assert entity._held is None
+
+    # Kein verspäteter Timer mehr, neue Werte werden sofort geschrieben
+    loop.advance_to(1100)
+    _publish(loop, entity, 1101, 7.0)
+    assert entity.writes == [(1000, 0.0), (1001, 5.0), (1101, 7.0)]
+
+
+def test_removing_the_budget_without_a_held_value_writes_nothing(loop):
+    options = {"min_schreibabstand": 10}
+    entity = _Sensor(loop, options)
+    options["min_schreibabstand"] = 0
+    entity._async_options_changed()
+    assert entity.writes == []
@@ -0,0 +1,164 @@
+"""Tests of the rolling windows, the demand meter and the rolling sums."""
+from __future__ import annotations
+
+import pytest
+
+from windows import DemandMeter, RollingSum, RollingWindow
+
+# =====================================================================
+# ROLLING WINDOW
+# =====================================================================
+
+
+def test_window_is_empty_before_the_first_update():
+    window = RollingWindow(60, 6)
+    assert window.min is None
+    assert window.max is None
+    assert window.mean is None
+
+
+def test_window_min_and_max_expire_with_their_bucket():
+    # 6 Buckets zu 10 s
+    window = RollingWindow(60, 6)
+    window.update(0, 100.0)
+    window.update(5, 10.0)
+    window.update(15, 50.0)
+    assert (window.min, window.max) == (10.0, 100.0)
+
+    # Bucket 0 (Spitze 100) fällt heraus, Bucket 1 (Minimum 10) noch nicht
+    window.update(70, 50.0)
+    assert (window.min, window.max) == (10.0, 50.0)
+    assert window.mean == pytest.approx((10.0 * 5 + 50.0 * 55) / 60)
+
+    window.update(80, 50.0)
+    assert (window.min, window.max) == (50.0, 50.0)
+
+
+def test_window_falls_back_to_the_next_extreme():
+    window = RollingWindow(60, 6)
+    window.update(0, 30.0)
+    window.update(15, 80.0)
+    window.update(25, 40.0)
+    window.update(70, 40.0)
+    assert (window.min, window.max) == (30.0, 80.0)
+
+    # Die 30 W enden in Bucket 1, die 80 W reichen bis in Bucket 2
+    window.update(80, 40.0)
+    assert (window.min, window.max) == (40.0, 80.0)
+    window.update(90, 40.0)
+    assert (window.min, window.max) == (40.0, 40.0)
+
+
+def test_window_after_a_long_gap_holds_the_last_value():
+    window = RollingWindow(60, 6)
+    window.update(0, 100.0)
+    window.update(5, 20.0)
+    window.update(1000, 5.0)
+    assert window.mean == pytest.approx(20.0)
+    assert (window.min, window.max) == (5.0, 20.0)
+
+
+# =====================================================================
+# DEMAND
+# =====================================================================
+
+
+def test_demand_intervals_align_to_quarter_hours():
+    meter = DemandMeter(900)
+    # 1_700_000_100 ist ein Vielfaches von 900 s
+    meter.update(1_700_000_123, 1000.0)
+    meter.update(1_700_000_999, 0.0)
+    assert meter.last is None
+    meter.update(1_700_001_000, 0.0)
+    assert meter.last == pytest.approx(1000.0 * 876 / 900)
+
+
+def test_demand_is_the_time_weighted_mean_of_an_interval():
+    meter = DemandMeter(900)
+    meter.update(0, 1000.0)
+    meter.update(450, 3000.0)
+    assert meter.demand == pytest.approx(1000.0)
+
+    meter.update(900, 0.0)
+    assert meter.last == pytest.approx(2000.0)
+    assert (meter.peak, meter.peak_at) == (pytest.approx(2000.0), 0)
+    assert meter.demand == 0.0
+
+
+def test_demand_closes_every_interval_of_a_gap():
+    meter = DemandMeter(900)
+    meter.update(0, 1000.0)
+    meter.update(2700, 0.0)
+    assert meter.last == pytest.approx(1000.0)
+    # Gleich hohe spätere Intervalle verdrängen die Spitze nicht
+    assert meter.peak_at == 0
+
+
+def test_demand_peak_carries_over_within_a_billing_period():
+    meter = DemandMeter(900, lambda start: "jan" if start < 1800 else "feb")
+    meter.update(0, 2000.0)
+    meter.update(900, 500.0)
+    meter.update(1800, 800.0)
+    assert meter.last == pytest.approx(500.0)
+    assert (meter.peak, meter.peak_at, meter.peak_period) == (2000.0, 0, "jan")
+
+    # Erstes Intervall im neuen Zeitraum setzt die Spitze zurück
+    meter.update(2700, 0.0)
+    assert (meter.peak, meter.peak_at, meter.peak_period) == (800.0, 1800, "feb")
+
+
+def test_demand_restored_peak_counts_only_in_its_period():
+    meter = DemandMeter(900, lambda start: "jan" if start < 1800 else "feb")
+    meter.restore_peak(5000.0, -900.0, "jan")
+    meter.update(0, 2000.0)
+    meter.update(900, 800.0)
+    assert (meter.peak, meter.peak_at) == (5000.0, -900.0)
+
+    meter.update(2700, 0.0)
+    assert (meter.peak, meter.peak_at, meter.peak_period) == (800.0, 1800, "feb")
+
+
+# =====================================================================
+# ROLLING SUM
+# =====================================================================
+
+
+def test_rolling_sum_drops_expired_buckets():
+    # 3 Buckets zu 100 s
+    rolling = RollingSum(300, 3)
+    rolling.add(0, 1.0)
+    rolling.add(150, 2.0)
+    rolling.add(250, 4.0)
+    assert rolling.total == 7.0
+
+    rolling.add(320, 0.0)
+    assert rolling.total == 6.0
+    rolling.add(1000, 1.0)
+    assert rolling.total == 1.0
+
+
+def test_rolling_sum_counts_late_amounts_in_the_running_bucket():
+    rolling = RollingSum(300, 3)
+    rolling.add(250, 1.0)
+    rolling.add(50, 2.0)
+    rolling.add(450, 0.0)
+    # Der verspätete Betrag läuft mit Bucket 2 aus, nicht mit Bucket 0
+    assert rolling.total == 3.0
+    rolling.add(550, 0.0)
+    assert rolling.total == 0.0
+
+
+def test_rolling_sum_restores_its_state():
+    rolling = RollingSum(300, 3)
+    rolling.add(0, 1.0)
+    rolling.add(150, 2.0)
+
+    restored = RollingSum(300, 3)
+    restored.restore(rolling.as_dict())
+    restored.add(320, 0.0)
+    assert restored.total == 2.0
+
+    # Anderer Zuschnitt: gespeicherter Zustand wird verworfen
+    other = RollingSum(300, 5)
+    other.restore(rolling.as_dict())
+    assert other.total == 0.0